@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+
+##################################################################################
+#
+# Benchmarks for the hostinfo.py collectors, run against synthetic inputs so
+# they can be run anywhere (no root or Red Hat host needed):
+#
+#     python3 benchmark.py            run every benchmark
+#     python3 benchmark.py accounts   run only the named benchmark(s)
+#
+##################################################################################
+
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from time import perf_counter
+
+import hostinfo
+
+
+# Write a synthetic passwd file with the given number of entries, a tenth of them service accounts
+def synthetic_passwd(path, count):
+    with open(path, 'w', encoding="utf-8") as file:
+        file.write("root:x:0:0:root:/root:/bin/bash\n")
+        for i in range(count - 1):
+            shell = "/sbin/nologin" if i % 10 == 0 else "/bin/bash"
+            file.write("user{i}:x:{uid}:{uid}:User {i}:/home/user{i}:{shell}\n".format(i=i, uid=1000 + i, shell=shell))
+
+
+# The three account collectors (one shared passwd index) must scale linearly with the number of passwd entries
+def bench_accounts():
+    print("accounts: passwd entries vs. user_accounts + monikers + service_accounts time")
+    print("{0:>10} {1:>10} {2:>14}".format("entries", "seconds", "us/entry"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in (10000, 50000, 100000, 200000, 500000):
+            root = os.path.join(tmp, "root{0}".format(count))
+            os.makedirs(os.path.join(root, "etc"))
+            synthetic_passwd(os.path.join(root, "etc", "passwd"), count)
+            hostinfo.ROOT = root
+            hostinfo.reset_run_caches()
+            start = perf_counter()
+            hostinfo.user_accounts()
+            hostinfo.monikers()
+            hostinfo.service_accounts()
+            elapsed = perf_counter() - start
+            print("{0:>10} {1:>10.3f} {2:>14.3f}".format(count, elapsed, elapsed / count * 1e6))
+        hostinfo.ROOT = "/"
+
+
+# The message building logs() did before records: str() of the collected list, quoting fixed up with chained
+# .replace() calls (each one a full copy of the message), then wrapped in a .format() string
+def legacy_message(key, values):
+    text = str(values)[1:-1]
+    text = text.replace("', '", "; ")
+    text = text.replace("'", "")
+    text = text.replace("\t", "")
+    text = text.replace("\n", "")
+    return "{key}='{text}'".format(key=key, text=text)
+
+
+# Records the size of a busy host's run: packages, passwd lines, sockets and sudoers rules
+def synthetic_records(scale):
+    packages = ["package{i}-1.{i}-{i}.el7.x86_64@base".format(i=i) for i in range(2000 * scale)]
+    accounts = ["user{i}:x:{uid}:{uid}:User {i}:/home/user{i}:/bin/bash".format(i=i, uid=1000 + i) for i in range(5000 * scale)]
+    sockets = ["tcp 10.0.0.{0}:{1} 10.0.1.{0}:443 ESTABLISHED {1}/proc{0}".format(i % 250, 1024 + i) for i in range(1000 * scale)]
+    sudoers = ["%group{i} ALL=(ALL) NOPASSWD: /usr/bin/systemctl restart svc{i}".format(i=i) for i in range(200 * scale)]
+    return [hostinfo.Record("apps", [("Installed_Packages1", packages)]),
+            hostinfo.Record("user_accounts", [("User_Accounts", accounts)]),
+            hostinfo.Record("netstat", [("Active_Sockets", sockets)]),
+            hostinfo.Record("sudoers", [("Sudoers_Entries", sudoers)])]
+
+
+# Output bytes per second of the old string-building path against the Serializer in each output format
+def bench_serialize():
+    print("serialize: output throughput of the old logs() string building vs. the record serializer")
+    print("{0:>8} {1:>8} {2:>12} {3:>10} {4:>10}".format("scale", "format", "bytes", "seconds", "MB/s"))
+    for scale in (1, 10, 50):
+        records = synthetic_records(scale)
+        paths = [("legacy", lambda record: legacy_message(*record.fields[0]))]
+        paths += [(name, hostinfo.Serializer(name).serialize) for name in hostinfo.OUTPUT_FORMATS]
+        for name, serialize in paths:
+            start = perf_counter()
+            size = sum(len(serialize(record).encode("utf-8")) for record in records)
+            elapsed = perf_counter() - start
+            print("{0:>8} {1:>8} {2:>12} {3:>10.4f} {4:>10.1f}".format(scale, name, size, elapsed, size / elapsed / 1e6))
+
+
+# Bytes sent by a full run against a delta run after a typical week: a few packages updated and an account added
+def bench_delta():
+    print("delta: bytes sent by a full run vs. a delta run after 1% of the packages changed")
+    print("{0:>8} {1:>12} {2:>12} {3:>8}".format("scale", "full", "delta", "ratio"))
+    serializer = hostinfo.Serializer()
+
+    def sent(records):
+        return sum(len(serializer.serialize(chunk).encode("utf-8")) for record in records
+                   for chunk in hostinfo.chunk_record(record, serializer, hostinfo.MESSAGE_BUDGET, "benchmark"))
+
+    for scale in (1, 10):
+        with tempfile.TemporaryDirectory() as cache:
+            hostinfo.CACHE_DIR = cache
+            records = synthetic_records(scale)
+            full = sent(hostinfo.delta_messages(records, [], timestamp=0))
+            packages = records[0].fields[0][1]
+            for i in range(0, len(packages), 100):
+                packages[i] = packages[i].replace("el7", "el7_9")
+            records[1].fields[0][1].append("newuser:x:9999:9999::/home/newuser:/bin/bash")
+            delta = sent(hostinfo.delta_messages(records, [], timestamp=3600))
+            print("{0:>8} {1:>12} {2:>12} {3:>8.1f}".format(scale, full, delta, full / delta))
+
+
+# Startup budget of hostinfo.py: import time and peak RSS of a fresh interpreter before the first collector runs.
+# No optional third-party module may be imported at startup
+STARTUP_BUDGET_MS = 150
+STARTUP_BUDGET_RSS_KB = 32 * 1024
+# The peak RSS is VmHWM from /proc/self/status: ru_maxrss of a child also counts the parent's peak, carried over the
+# fork until exec
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import hostinfo
+hostinfo.parse_args([])
+elapsed = (time.perf_counter() - start) * 1000
+with open("/proc/self/status") as file:
+    rss = [int(line.split()[1]) for line in file if line.startswith("VmHWM:")][0]
+print(json.dumps({"ms": elapsed, "rss": rss,
+                  "optional": [name for name in ("numpy", "lxml", "psutil", "netifaces") if name in sys.modules]}))
+"""
+
+
+# Import time and RSS of hostinfo.py in a fresh interpreter (median of 5), checked against the startup budget
+def bench_startup():
+    print("startup: import hostinfo in a fresh interpreter (budget {0} ms, {1} KB RSS)".format(STARTUP_BUDGET_MS, STARTUP_BUDGET_RSS_KB))
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = [json.loads(subprocess.check_output([sys.executable, "-c", STARTUP_PROBE], cwd=here)) for i in range(5)]
+    runs.sort(key=lambda run: run["ms"])
+    median = runs[len(runs) // 2]
+    print("{0:>10} {1:>10} {2:>10}  {3}".format("import_ms", "rss_kb", "budget", "optional modules imported"))
+    within = median["ms"] <= STARTUP_BUDGET_MS and median["rss"] <= STARTUP_BUDGET_RSS_KB and not median["optional"]
+    print("{0:>10.1f} {1:>10} {2:>10}  {3}".format(median["ms"], median["rss"], "ok" if within else "OVER",
+                                                   ", ".join(median["optional"]) or "none"))
+
+
+# Write a synthetic enterprise account export: <users><user><username>..</username><name>..</name>...</user>...</users>
+def synthetic_enterprise(path, count):
+    with open(path, 'w', encoding="utf-8") as file:
+        file.write("<users>\n")
+        for i in range(count):
+            file.write("<user><username>user{i}</username><name>User {i}</name><department>Dept {d}</department>"
+                       "<email>user{i}@example.com</email></user>\n".format(i=i, d=i % 100))
+        file.write("</users>\n")
+
+
+# Enterprise reconciliation: streaming parse of the export, the cached index on the next run and the set
+# difference against a 50k-account passwd file (half of them not in the export)
+def bench_enterprise():
+    print("enterprise: users in export vs. parse, cached index load and reconciliation time")
+    print("{0:>10} {1:>10} {2:>10} {3:>10} {4:>10}".format("users", "MB", "parse_s", "cached_s", "diff_s"))
+    with tempfile.TemporaryDirectory() as tmp:
+        hostinfo.CACHE_DIR = os.path.join(tmp, "cache")
+        passwd = os.path.join(tmp, "passwd")
+        with open(passwd, 'w', encoding="utf-8") as file:
+            for i in range(50000):
+                file.write("user{i}:x:{uid}:{uid}::/home/user{i}:/bin/bash\n".format(i=i * 2, uid=1000 + i))
+        for count in (100000, 500000, 1000000):
+            path = os.path.join(tmp, "users{0}.xml".format(count))
+            synthetic_enterprise(path, count)
+            start = perf_counter()
+            hostinfo.enterprise_usernames(path)
+            parsed = perf_counter() - start
+            start = perf_counter()
+            names = hostinfo.enterprise_usernames(path)
+            cached = perf_counter() - start
+            start = perf_counter()
+            [name for name in hostinfo.login_names(passwd) if name not in names]
+            diff = perf_counter() - start
+            print("{0:>10} {1:>10.1f} {2:>10.3f} {3:>10.3f} {4:>10.4f}".format(count, os.path.getsize(path) / 1e6, parsed, cached, diff))
+
+
+# Write a synthetic updateinfo.xml: count security advisories spread over 10k package names, each fixing 1-3 packages
+def synthetic_updateinfo(path, count):
+    with open(path, 'w', encoding="utf-8") as file:
+        file.write("<updates>\n")
+        for i in range(count):
+            file.write('<update type="security"><id>RHSA-2020:{0}</id><severity>Important</severity><pkglist><collection>'.format(i))
+            for j in range(1 + i % 3):
+                name = "package{0}".format((i * 7 + j) % 10000)
+                file.write('<package name="{0}" epoch="0" version="1.{1}" release="{2}.el7" arch="x86_64"/>'.format(name, i % 50, i % 20))
+            file.write("</collection></pkglist></update>\n")
+        file.write("</updates>\n")
+
+
+# Advisory matching: compiling a 100k-advisory feed (once per feed), opening the memory-mapped index and matching
+# 3,000 installed packages against it (every run), on an unpatched host and on a fully patched one
+def bench_advisories():
+    print("advisories: 100k advisories vs. compile, open and match of 3,000 packages")
+    print("{0:>10} {1:>10} {2:>10} {3:>10} {4:>10} {5:>11}".format("compile_s", "index_MB", "open_ms", "match_ms", "pairs", "patched_ms"))
+    with tempfile.TemporaryDirectory() as tmp:
+        hostinfo.CACHE_DIR = tmp
+        feed = os.path.join(tmp, "updateinfo.xml")
+        synthetic_updateinfo(feed, 100000)
+        installed = [hostinfo.Package("package{0}".format(i * 3), "0", "1.{0}".format(i % 60), "{0}.el7".format(i % 25), "x86_64", "")
+                     for i in range(3000)]
+        patched = [package._replace(version="1.99", release="99.el7") for package in installed]
+        start = perf_counter()
+        hostinfo.advisory_index(feed)
+        compiled = perf_counter() - start
+        hostinfo._advisory_indexes.clear()
+        start = perf_counter()
+        index = hostinfo.advisory_index(feed)
+        opened = perf_counter() - start
+        start = perf_counter()
+        pairs = sum(len(index.matches(package)) for package in installed)
+        matched = perf_counter() - start
+        start = perf_counter()
+        for package in patched:
+            index.matches(package)
+        current = perf_counter() - start
+        size = os.path.getsize(os.path.join(tmp, hostinfo.ADVISORY_INDEX))
+        print("{0:>10.3f} {1:>10.1f} {2:>10.2f} {3:>10.2f} {4:>10} {5:>11.2f}".format(compiled, size / 1e6, opened * 1000, matched * 1000,
+                                                                                pairs, current * 1000))
+
+
+# SUID/SGID sweep of a synthetic tree (50k files, 200 of them 1 MB SUID binaries): the first run hashes every binary,
+# the next one only walks the tree and hashes the one binary that changed
+def bench_setuid():
+    print("setuid: sweep of 50k files with 200 1 MB SUID binaries, cold vs. warm hash cache")
+    print("{0:>8} {1:>10} {2:>10} {3:>10}".format("run", "walk_s", "hash_s", "found"))
+    with tempfile.TemporaryDirectory() as tmp:
+        hostinfo.CACHE_DIR = os.path.join(tmp, "cache")
+        tree = os.path.join(tmp, "tree")
+        for i in range(500):
+            directory = os.path.join(tree, "d{0}".format(i // 50), "d{0}".format(i))
+            os.makedirs(directory)
+            for j in range(100):
+                path = os.path.join(directory, "f{0}".format(j))
+                with open(path, "wb") as file:
+                    file.write(os.urandom(1024 * 1024) if j == 0 and i < 200 else b"x")
+                if j == 0 and i < 200:
+                    os.chmod(path, 0o4755)
+        for run in ("cold", "warm"):
+            start = perf_counter()
+            found = list(hostinfo.setuid_walk(tree, set()))
+            walked = perf_counter() - start
+            start = perf_counter()
+            cache = hostinfo.HashCache("setuid_hashes")
+            cache.hashes(found)
+            cache.save()
+            hashed = perf_counter() - start
+            print("{0:>8} {1:>10.3f} {2:>10.3f} {3:>10}".format(run, walked, hashed, len(found)))
+            with open(found[0][0], "ab") as file:
+                file.write(b"changed")
+
+
+# Transport that only counts what it is given
+class CountingTransport(object):
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+
+    def send(self, message):
+        self.messages += 1
+        self.bytes += len(message)
+
+    def close(self):
+        pass
+
+
+# One --root scan in a fresh interpreter: sys.argv is the cache directory, the number of jobs and the roots. Prints
+# the time taken, the messages sent and the peak RSS of the scanning (parent) process, VmHWM from /proc/self/status,
+# so each run is measured on its own
+ROOTS_PROBE = """
+import json, sys, time
+import benchmark, hostinfo
+transport = benchmark.CountingTransport()
+open_transport = hostinfo.open_transport
+hostinfo.open_transport = lambda options: transport
+try:
+    hostinfo.CACHE_DIR = sys.argv[1]
+    hostinfo.OPTIONS = hostinfo.parse_args(["--jobs", sys.argv[2]] + [arg for root in sys.argv[3:] for arg in ("--root", root)])
+    start = time.perf_counter()
+    hostinfo.scan_roots()
+    elapsed = time.perf_counter() - start
+finally:
+    hostinfo.open_transport = open_transport
+with open("/proc/self/status") as file:
+    rss = [int(line.split()[1]) for line in file if line.startswith("VmHWM:")][0]
+print(json.dumps({"seconds": elapsed, "messages": transport.messages, "rss": rss}))
+"""
+
+
+# Offline scan of many roots (passwd, shadow and sudoers each) with 1, 2 and 4 worker processes, each in a fresh
+# interpreter; the parent's peak RSS must not grow with the number of roots. The speedup is bounded by the CPUs here
+def bench_roots():
+    print("roots: 64 synthetic roots (10k passwd entries each) vs. worker processes ({0} CPUs)".format(os.cpu_count()))
+    print("{0:>6} {1:>10} {2:>10} {3:>12} {4:>12}".format("jobs", "seconds", "roots/s", "messages", "peak_RSS_KB"))
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        roots = []
+        for i in range(64):
+            root = os.path.join(tmp, "root{0}".format(i))
+            os.makedirs(os.path.join(root, "etc"))
+            synthetic_passwd(os.path.join(root, "etc", "passwd"), 10000)
+            with open(os.path.join(root, "etc", "shadow"), 'w', encoding="utf-8") as file:
+                file.write("root:$6$x:18000:0:99999:7:::\n")
+            with open(os.path.join(root, "etc", "sudoers"), 'w', encoding="utf-8") as file:
+                file.write("root ALL=(ALL) ALL\n%wheel ALL=(ALL) ALL\n")
+            roots.append(root)
+        for jobs in (1, 2, 4):
+            run = json.loads(subprocess.check_output([sys.executable, "-c", ROOTS_PROBE, os.path.join(tmp, "cache{0}".format(jobs)),
+                                                      str(jobs)] + roots, cwd=here))
+            print("{0:>6} {1:>10.3f} {2:>10.1f} {3:>12} {4:>12}".format(jobs, run["seconds"], len(roots) / run["seconds"],
+                                                                      run["messages"], run["rss"]))
+
+
+
+# Peak Python heap of collecting the passwd accounts, sudoers rules and rpm packages of a synthetic root and sending
+# them to a transport, their sections streamed as they are read; it must stay flat as the inputs grow tenfold
+def bench_memory():
+    print("memory: entries per section vs. the peak heap of collecting and sending them")
+    print("{0:>10} {1:>10} {2:>10} {3:>12} {4:>12}".format("entries", "seconds", "messages", "sent_KB", "peak_KB"))
+    path = os.environ["PATH"]
+    for count in (10000, 100000):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "etc", "sudoers.d"))
+            os.makedirs(os.path.join(tmp, "bin"))
+            synthetic_passwd(os.path.join(tmp, "etc", "passwd"), count)
+            with open(os.path.join(tmp, "etc", "sudoers"), 'w', encoding="utf-8") as file:
+                file.write("root ALL=(ALL) ALL\n#includedir /etc/sudoers.d\n")
+            with open(os.path.join(tmp, "etc", "sudoers.d", "users"), 'w', encoding="utf-8") as file:
+                for i in range(count):
+                    file.write("user{0} ALL=(ALL) /usr/bin/systemctl restart svc{0}\n".format(i))
+            with open(os.path.join(tmp, "bin", "rpm"), 'w', encoding="utf-8") as file:
+                file.write("#!/bin/sh\nawk 'BEGIN {{ for (i = 0; i < {0}; i++) printf \"pkg%d\\t(none)\\t1.%d\\t1.el7\\tx86_64\\n\", i, i }}'\n"
+                           .format(count))
+            os.chmod(os.path.join(tmp, "bin", "rpm"), 0o755)
+            os.environ["PATH"] = os.path.join(tmp, "bin") + os.pathsep + path
+            hostinfo.ROOT = tmp
+            hostinfo.CACHE_DIR = os.path.join(tmp, "cache")
+            hostinfo.OPTIONS = hostinfo.parse_args(["--no-cache"])
+            hostinfo.reset_run_caches()
+            transport = CountingTransport()
+            tracemalloc.start()
+            start = perf_counter()
+            outlet = hostinfo.Outlet(transport.send)
+            messages, failed, completed = hostinfo.gather(["user_accounts", "service_accounts", "monikers", "sudoers", "apps"],
+                                                          outlet=outlet)
+            for message in messages:
+                outlet.write(message)
+            elapsed = perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            os.environ["PATH"] = path
+            hostinfo.ROOT = "/"
+            hostinfo.reset_run_caches()
+            print("{0:>10} {1:>10.3f} {2:>10} {3:>12.0f} {4:>12.0f}".format(count, elapsed, transport.messages,
+                                                                          transport.bytes / 1024, peak / 1024))
+
+
+# Captured 'rpm -qa --queryformat RPM_QUERYFORMAT' output of a RHEL 7 host, with the packages it must parse to:
+# no epoch, multilib and multiple kernel entries, and gpg-pubkey with neither epoch nor arch
+RPM_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rpm-qa-queryformat.txt")
+RPM_EXPECTED = {
+    ("bash", "0", "4.2.46", "35.el7_9", "x86_64"),
+    ("glibc", "0", "2.17", "326.el7_9", "i686"),
+    ("openssl-libs", "1", "1.0.2k", "26.el7_9", "x86_64"),
+    ("kernel", "0", "3.10.0", "1160.108.1.el7", "x86_64"),
+    ("net-tools", "0", "2.0", "0.25.20131004git.el7", "x86_64"),
+    ("gpg-pubkey", "0", "f4a80eb5", "53a7ff4b", "noarch"),
+}
+
+
+# Parse the captured rpm dump and check it against RPM_EXPECTED, then time the parser on the dump repeated to 100k
+# packages
+def bench_rpm():
+    print("rpm: parse the captured queryformat dump, then 100k packages")
+    with open(RPM_FIXTURE, encoding="utf-8") as file:
+        packages = list(hostinfo.parse_rpm_queryformat(file, {("yum", "3.4.3", "168.el7.centos", "noarch"): "base"}))
+        file.seek(0)
+        lines = file.readlines()
+    parsed = set(package[:5] for package in packages)
+    within = (len(packages) == len(lines) and RPM_EXPECTED <= parsed
+              and [package.repo for package in packages if package.repo] == ["base"])
+    print("{0:>10} {1:>10} {2:>10}".format("packages", "expected", "check"))
+    print("{0:>10} {1:>10} {2:>10}".format(len(packages), len(lines), "ok" if within else "MISMATCH"))
+    for package in sorted(RPM_EXPECTED - parsed):
+        print("  missing: " + " ".join(package))
+    lines = lines * (100000 // len(lines) + 1)
+    start = perf_counter()
+    count = sum(1 for package in hostinfo.parse_rpm_queryformat(lines))
+    elapsed = perf_counter() - start
+    print("{0:>10} {1:>10.3f} {2:>12.0f} packages/s".format(count, elapsed, count / elapsed))
+
+
+# Local stand-in for a syslog server: reads octet-counted frames from every connection and counts them
+class SyslogListener(object):
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        self.address = self.sock.getsockname()
+        self.frames = 0
+        self.connections = 0
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            conn, peer = self.sock.accept()
+            self.connections += 1
+            threading.Thread(target=self.read, args=(conn,), daemon=True).start()
+
+    def read(self, conn):
+        data = b""
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                return
+            data += chunk
+            while b" " in data:
+                length, rest = data.split(b" ", 1)
+                if len(rest) < int(length):
+                    break
+                data = rest[int(length):]
+                self.frames += 1
+
+
+# Local stand-in for the Splunk HTTP Event Collector, counts the events in every gzipped POST
+class HecListener(HTTPServer):
+    def __init__(self):
+        self.events = 0
+        self.clients = set()
+        listener = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = gzip.decompress(self.rfile.read(int(self.headers["Content-Length"])))
+                listener.events += body.count(b'{"time"')
+                listener.clients.add(self.client_address)
+                reply = b'{"text":"Success","code":0}'
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+# Messages per second through the TCP syslog and HEC transports against local stand-ins, and how many
+# connections they needed (a persistent transport opens one)
+def bench_transport():
+    print("transport: messages through each transport to a local stand-in")
+    print("{0:>8} {1:>10} {2:>10} {3:>12} {4:>12}".format("transport", "messages", "seconds", "messages/s", "connections"))
+    serializer = hostinfo.Serializer()
+    messages = [serializer.serialize(chunk) for record in synthetic_records(1)
+                for chunk in hostinfo.chunk_record(record, serializer, hostinfo.MESSAGE_BUDGET, "benchmark")] * 20
+    with tempfile.TemporaryDirectory() as spool:
+        listener = SyslogListener()
+        start = perf_counter()
+        transport = hostinfo.SyslogTransport(listener.address, spool_dir=spool)
+        for message in messages:
+            transport.send(message)
+        transport.close()
+        while listener.frames < transport.delivered:
+            pass
+        elapsed = perf_counter() - start
+        print("{0:>8} {1:>10} {2:>10.3f} {3:>12.0f} {4:>12}".format("tcp", listener.frames, elapsed, listener.frames / elapsed, listener.connections))
+        hec = HecListener()
+        start = perf_counter()
+        transport = hostinfo.HecTransport("http://127.0.0.1:{0}/services/collector/event".format(hec.server_port), "token", spool_dir=spool)
+        for message in messages:
+            transport.send(message)
+        transport.close()
+        elapsed = perf_counter() - start
+        print("{0:>8} {1:>10} {2:>10.3f} {3:>12.0f} {4:>12}".format("hec", hec.events, elapsed, hec.events / elapsed, len(hec.clients)))
+
+
+# Local stand-in for chronyd's command port: answers every REQ_TRACKING with a fixed tracking state (source
+# 192.0.2.1, stratum 3, last offset 1.25 ms)
+class ChronyListener(object):
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = self.sock.getsockname()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    # chronyd's 32-bit float with a fixed exponent of -5: ample range and precision for an offset in seconds
+    @staticmethod
+    def pack_float(value):
+        return (-5 & 0x7f) << 25 | int(round(value * 2 ** 30)) & 0x1ffffff
+
+    def serve(self):
+        tracking = hostinfo.CHRONY_TRACKING.pack(0xc0000201, socket.inet_aton("192.0.2.1") + bytes(12), 1, 0, 3, 0, 0, 0, 0,
+                                                 0, self.pack_float(0.00125), 0, 0, 0, 0, 0, 0, 0)
+        while True:
+            request, peer = self.sock.recvfrom(1024)
+            sequence = hostinfo.CHRONY_REQUEST.unpack_from(request)[6]
+            reply = hostinfo.CHRONY_REPLY.pack(hostinfo.CHRONY_PROTO_VERSION, 2, 0, 0, hostinfo.CHRONY_REQ_TRACKING,
+                                               hostinfo.CHRONY_RPY_TRACKING, 0, 0, 0, 0, sequence, 0, 0)
+            self.sock.sendto(reply + tracking, peer)
+
+
+# Local stand-in for ntpd's control port: answers every mode 6 READVAR with the system variables split over two
+# fragments, the first one flagged as having more to come
+class NtpdListener(object):
+    FRAGMENTS = [b'version="ntpd 4.2.6p5", leap=00, stratum=2, refid=192.0.2.2, ',
+                 b'offset=-0.250, sys_jitter=0.125']
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = self.sock.getsockname()
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            request, peer = self.sock.recvfrom(1024)
+            sequence = hostinfo.NTP_CONTROL.unpack_from(request)[2]
+            offset = 0
+            for i, fragment in enumerate(self.FRAGMENTS):
+                op = 0x80 | hostinfo.NTP_CONTROL_READVAR | (hostinfo.NTP_CONTROL_MORE if i < len(self.FRAGMENTS) - 1 else 0)
+                self.sock.sendto(hostinfo.NTP_CONTROL.pack(0x16, op, sequence, 0, 0, offset, len(fragment)) + fragment, peer)
+                offset += len(fragment)
+
+
+# Query chronyd and ntpd stand-ins and print the parsed tracking state, then time the same queries against a port
+# nobody listens on: the connected sockets must fail at once on the ICMP port unreachable, not at the timeout
+def bench_timesource():
+    print("timesource: chronyd and ntpd stand-ins on local UDP ports, then a missing daemon (timeout {0} s)".format(hostinfo.TIME_DAEMON_TIMEOUT))
+    print("{0:>8} {1:>10} {2:>12} {3:>8} {4:>10} {5:>10}".format("daemon", "ms", "source", "stratum", "offset_ms", "leap"))
+    chronyd = ChronyListener()
+    ntpd = NtpdListener()
+    for query, address in ((hostinfo.chrony_tracking, chronyd.address), (hostinfo.ntpd_sysvars, ntpd.address)):
+        start = perf_counter()
+        source = query(address=address)
+        print("{0:>8} {1:>10.2f} {2:>12} {3:>8} {4:>10.3f} {5:>10}".format(source.daemon, (perf_counter() - start) * 1000, source.source,
+                                                                          source.stratum, source.offset_ms, source.leap))
+    unused = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    unused.bind(("127.0.0.1", 0))
+    address = unused.getsockname()
+    unused.close()
+    for name, query in (("chronyd", hostinfo.chrony_tracking), ("ntpd", hostinfo.ntpd_sysvars)):
+        start = perf_counter()
+        try:
+            query(address=address)
+            error = "answered"
+        except OSError as err:
+            error = type(err).__name__
+        print("{0:>8} {1:>10.2f} {2:>12}".format(name, (perf_counter() - start) * 1000, error))
+
+
+BENCHMARKS = {
+    "accounts": bench_accounts,
+    "advisories": bench_advisories,
+    "delta": bench_delta,
+    "enterprise": bench_enterprise,
+    "memory": bench_memory,
+    "roots": bench_roots,
+    "rpm": bench_rpm,
+    "serialize": bench_serialize,
+    "setuid": bench_setuid,
+    "startup": bench_startup,
+    "timesource": bench_timesource,
+    "transport": bench_transport,
+}
+
+
+def main(argv):
+    for name in argv or sorted(BENCHMARKS):
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -9,11 +9,12 @@
 # Script to pull security-relevant Red Hat host information to build and
 # maintain a current asset inventory of all hosts. Send the identified
 # host details via syslog into Splunk. This script requires that appropriate
-# syslog forwarding is configured on the host, and if using rsyslog,
-# that the following entries are in /etc/rsyslog.conf or appropriate drop-in:
-# $ModLoad imuxsock;$MaxMessageSize 500k;$PreserveFQDN on
-# and that an appropriate query/report/dashboard is implemented in Splunk
-# (or the network-appropriate syslog ingestion platform).
+# syslog forwarding is configured on the host (if using rsyslog, that the
+# entries '$ModLoad imuxsock' and '$PreserveFQDN on' are in /etc/rsyslog.conf
+# or an appropriate drop-in), and that an appropriate query/report/dashboard
+# is implemented in Splunk (or the network-appropriate syslog ingestion platform).
+# Messages are split to fit --max-message-size, which by default is sized for
+# rsyslog's 8k $MaxMessageSize, so $MaxMessageSize does not need to be raised.
 #
 # This script should be run weekly on all RedHat hosts across the enterprise.
 # The data sent via this script on a randomly selected server was 184k,
@@ -25,6 +26,7 @@
 
 # Import statements for all standard modules
 import subprocess
+import io
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
@@ -34,701 +36,3553 @@ import logging
 import logging.handlers
 import os
 import os.path
-import glob
 import re
 import platform
+import socket
+import struct
+import argparse
+import threading
+import json
+import tempfile
+import ctypes
+import ctypes.util
+import bisect
+import functools
+import errno
+import itertools
+import random
+import uuid
+import hashlib
+import select
+import signal
+import resource
+import traceback
+import importlib
+import shutil
+import queue
+from time import monotonic
+from time import sleep
+from time import time as now
+from collections import namedtuple
+from stat import S_ISUID, S_ISGID, S_IMODE
 
-# This may not be a standard module in your enterprise, so a yum install option is provided
+# CPU time of the calling thread: time.thread_time is Python 3.7+, on 3.6 (RHEL 7's python3) it is read from
+# getrusage, for the whole process where the platform has no RUSAGE_THREAD
 try:
-    import numpy as np
-except:
+    from time import thread_time
+except ImportError:
+    def thread_time():
+        usage = resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+        return usage.ru_utime + usage.ru_stime
+
+# Third-party modules are optional: they are imported on first use by the code that wants them and never installed
+# at run time, and every caller has a standard library fallback for when one is missing
+_optional_modules = {}
+_optional_modules_lock = threading.Lock()
+
+
+# Import an optional module by name, None when it is not installed
+def optional_import(name):
+    with _optional_modules_lock:
+        if name not in _optional_modules:
+            try:
+                _optional_modules[name] = importlib.import_module(name)
+            except ImportError:
+                _optional_modules[name] = None
+        return _optional_modules[name]
+
+
+# Define today's date to use to identify the running of this script
+date = date.today()
+
+# Every collector gets a hard deadline (in seconds) so a hung command cannot stall the cron job,
+# yum and netstat are given longer on busy hosts
+COLLECTOR_TIMEOUT = 120
+COLLECTOR_TIMEOUTS = {"apps": 300, "vulnerabilities": 300, "netstat": 300, "setuid_files": 300}
+
+# With a run budget (--budget) collectors start in priority order, lowest number first, at most COLLECTOR_WORKERS at
+# a time, and those that would start after the budget has run out are skipped: security-critical sections first,
+# slow-changing inventory last
+COLLECTOR_PRIORITIES = {"user_accounts": 0, "service_accounts": 0, "monikers": 0, "sudoers": 0, "root_change": 0,
+                        "password_aging": 0, "sestatus": 0, "netstat": 0, "processes": 0, "apps": 2, "hwinfo": 2,
+                        "setuid_files": 2}
+COLLECTOR_DEFAULT_PRIORITY = 1
+COLLECTOR_WORKERS = 4
+
+# External commands are killed after this many seconds, kept below the collector deadline
+COMMAND_TIMEOUT = 110
+
+# Offline scans (--root) read the files of another system (a mounted disk image, a chroot or an unpacked container
+# image) instead of the live host's: every path a file-based collector opens goes through root_path()
+ROOT = '/'
+# Symlinks followed while resolving one path, as the kernel's limit (ELOOP past it)
+ROOT_MAX_SYMLINKS = 40
+
+
+# Resolve an absolute path under ROOT the way the kernel does inside a chroot: absolute symlink targets are re-rooted
+# and '..' stops at ROOT, so a link in an image never points at the scanning host's files. A component that does not
+# exist ends the symlink resolution, the rest is joined as is. On the live host the path is returned unchanged
+def root_path(path):
+    if ROOT == '/':
+        return path
+    parts = [part for part in reversed(path.split("/")) if part]
+    resolved = []
+    links = 0
+    while parts:
+        part = parts.pop()
+        if part == ".":
+            continue
+        if part == "..":
+            if resolved:
+                resolved.pop()
+            continue
+        try:
+            target = os.readlink(os.path.join(ROOT, *resolved, part))
+        except OSError:
+            resolved.append(part)
+            continue
+        links += 1
+        if links > ROOT_MAX_SYMLINKS:
+            raise OSError(errno.ELOOP, os.strerror(errno.ELOOP), path)
+        if target.startswith("/"):
+            resolved = []
+        parts.extend(part for part in reversed(target.split("/")) if part)
+    return os.path.join(ROOT, *resolved)
+
+
+# Slow-changing results are kept between runs in this directory
+CACHE_DIR = '/var/cache/hostinfo'
+
+
+# Read a JSON cache entry written by write_cache(), None when missing or unreadable
+def read_cache(name):
     try:
-        subprocess.call(["python3", "-m", "pip", "install", "numpy"])
-        import numpy as np
-    except:
-        print("**ERROR INSTALLING NUMPY**")
-        exit(1)
-# First encouraged but not required non-standard package
-try:
-    import netifaces
-except:
+        with open(os.path.join(CACHE_DIR, name + ".json"), encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+# Write a JSON cache entry atomically (temporary file then rename) so a crashed run never leaves half an entry;
+# a cache that cannot be written only costs the next run the work again
+def write_cache(name, data):
     try:
-        subprocess.call(["python3", "-m", "pip", "install", "netifaces"])
-        import netifaces
-    except:
-        print("**ERROR INSTALLING NETIFACES**")
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix="." + name)
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp, os.path.join(CACHE_DIR, name + ".json"))
+    except OSError:
         pass
-## Second encouraged but not required non-standard package
-try:
-    import psutil
-except:
+
+
+# Read a JSON-lines cache entry written by write_cache_lines(): its header, and a generator of the items that reads
+# them as they are wanted. (None, None) when missing or unreadable
+def read_cache_lines(name):
     try:
-        subprocess.call(["python3", "-m", "pip", "install", "psutil"])
-        import psutil
-    except:    
-        print("**ERROR INSTALLING PSUTIL**")
-        pass
-# Required non-standard module for parsing xmls
-try:
-    from lxml import etree
-except:
+        file = open(os.path.join(CACHE_DIR, name + ".jsonl"), encoding="utf-8")
+    except OSError:
+        return None, None
     try:
-        subprocess.call(["python3", "-m", "pip", "install", "lxml"])
-        from lxml import etree
-    except:
-        print("**ERROR INSTALLING LXML**")
+        header = json.loads(file.readline())
+    except (OSError, ValueError):
+        file.close()
+        return None, None
 
+    def items():
+        with file:
+            for line in file:
+                yield json.loads(line)
+    return header, items()
 
-# Define today's date to use to identify the running of this script
-date = date.today()
+
+# Pass the items of a stream through while writing them to a JSON-lines cache entry after its header, so a result too
+# large to hold is cached without being held. The entry is renamed into place once the stream has run out; a stream
+# left unfinished or a cache that cannot be written leaves the entry as it was
+def write_cache_lines(name, header, items):
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix="." + name)
+    except OSError:
+        yield from items
+        return
+    file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(item):
+        if file.closed:
+            return
+        try:
+            file.write(json.dumps(item) + "\n")
+        except OSError:
+            abandon()
+
+    def abandon():
+        try:
+            file.close()
+        except OSError:
+            pass
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+    try:
+        write(header)
+        for item in items:
+            write(item)
+            yield item
+        if not file.closed:
+            try:
+                file.close()
+                os.replace(tmp, os.path.join(CACHE_DIR, name + ".jsonl"))
+            except OSError:
+                abandon()
+    finally:
+        if not file.closed:
+            abandon()
+
+
+# Whether results cached by earlier runs may be used and updated; --no-cache computes everything again and leaves the
+# cache as it was (the --delta snapshot is not a cached result and is always kept)
+def cache_enabled():
+    return not OPTIONS.no_cache
+
+
+# The cache directory is trimmed to this many bytes after every run, least recently written entries first
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+# Delete the least recently written cache entries until the cache fits in max_bytes
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    try:
+        entries = [entry for entry in os.scandir(CACHE_DIR) if entry.name.endswith((".json", ".jsonl")) and entry.is_file()]
+        entries = sorted(((entry.stat(), entry.path) for entry in entries), key=lambda item: item[0].st_mtime)
+    except OSError:
+        return
+    total = sum(stat.st_size for stat, path in entries)
+    for stat, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= stat.st_size
+        except OSError:
+            continue
+
+
+# Cost of one collector (or of the messages of one section) in the current run: wall and CPU seconds of its thread
+# (and of the threads it hands work to), subprocesses it spawned, bytes sent for its records and the error that stopped it, if any
+class CollectorMetrics(object):
+    __slots__ = ("name", "wall", "cpu", "spawns", "bytes", "error")
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.spawns = 0
+        self.bytes = 0
+        self.error = ""
+
+
+# Metrics of the current run keyed on collector or section name, in the order they were first seen; the metrics of
+# the collector running on a thread are reachable from run_command() through _current
+_metrics = {}
+_metrics_lock = threading.Lock()
+_current = threading.local()
+
+
+def metrics_for(name):
+    with _metrics_lock:
+        if name not in _metrics:
+            _metrics[name] = CollectorMetrics(name)
+        return _metrics[name]
+
+
+# Start a new run: forget the metrics of the last one
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# Result of one external command; wall is the elapsed time in seconds
+CommandResult = namedtuple("CommandResult", ["argv", "stdout", "stderr", "returncode", "wall"])
+
+# Per-run cache of command results keyed on argv, so every distinct command is spawned at most once per run
+# even when several collectors ask for it at the same time
+_command_cache = {}
+_command_locks = {}
+_command_locks_guard = threading.Lock()
+
+
+# Run an external command (never through a shell) with output captured, returning the cached result on repeat calls.
+# A missing command is reported with returncode 127 and a timed out command with returncode 124, like the shell does.
+def run_command(argv, timeout=COMMAND_TIMEOUT):
+    argv = tuple(argv)
+    with _command_locks_guard:
+        lock = _command_locks.setdefault(argv, threading.Lock())
+    with lock:
+        if argv in _command_cache:
+            return _command_cache[argv]
+        env = dict(os.environ, LC_ALL="C")
+        metrics = getattr(_current, "metrics", None)
+        if metrics is not None:
+            metrics.spawns += 1
+        start = monotonic()
+        try:
+            proc = subprocess.run(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  env=env, timeout=timeout)
+            stdout, stderr, returncode = proc.stdout, proc.stderr, proc.returncode
+        except subprocess.TimeoutExpired as err:
+            stdout, stderr, returncode = err.stdout or b"", "timed out after {0}s".format(timeout).encode(), 124
+        except FileNotFoundError as err:
+            stdout, stderr, returncode = b"", str(err).encode(), 127
+        except OSError as err:
+            stdout, stderr, returncode = b"", str(err).encode(), 126
+        result = CommandResult(argv, stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace"),
+                               returncode, monotonic() - start)
+        _command_cache[argv] = result
+        return result
+
+
+# Result of a command run by spool_command(): file is an unnamed temporary file holding its stdout
+SpooledCommand = namedtuple("SpooledCommand", ["argv", "file", "stderr", "returncode", "wall"])
+
+
+# Run an external command like run_command(), for output too large to hold: stdout goes to a temporary file that is
+# kept (and the command spawned once) for the rest of the run, and is read with spooled_lines()
+def spool_command(argv, timeout=COMMAND_TIMEOUT):
+    key = ("spool",) + tuple(argv)
+    with _command_locks_guard:
+        lock = _command_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _command_cache:
+            return _command_cache[key]
+        env = dict(os.environ, LC_ALL="C")
+        metrics = getattr(_current, "metrics", None)
+        if metrics is not None:
+            metrics.spawns += 1
+        stdout = tempfile.TemporaryFile()
+        start = monotonic()
+        try:
+            proc = subprocess.run(argv, stdin=subprocess.DEVNULL, stdout=stdout, stderr=subprocess.PIPE, env=env,
+                                  timeout=timeout)
+            stderr, returncode = proc.stderr, proc.returncode
+        except subprocess.TimeoutExpired:
+            stderr, returncode = "timed out after {0}s".format(timeout).encode(), 124
+        except FileNotFoundError as err:
+            stderr, returncode = str(err).encode(), 127
+        except OSError as err:
+            stderr, returncode = str(err).encode(), 126
+        result = SpooledCommand(key[1:], stdout, stderr.decode("utf-8", "replace"), returncode, monotonic() - start)
+        _command_cache[key] = result
+        return result
+
+
+# Lines of a spooled command's stdout, read through a file description of their own (/proc/self/fd), so every
+# collector reading the output has its own offset
+def spooled_lines(result):
+    with open("/proc/self/fd/{0}".format(result.file.fileno()), encoding="utf-8", errors="replace") as file:
+        yield from file
+
+
+# One log message: the collector it came from and its (key, value) fields in output order.
+# A value is a string, a number or a list of strings; how it is quoted is left to the Serializer
+class Record(object):
+    __slots__ = ("name", "fields")
+
+    def __init__(self, name, fields=()):
+        self.name = name
+        self.fields = list(fields)
+
+    def add(self, key, value):
+        self.fields.append((key, value))
+        return self
+
+
+# Raised by a collector that cannot produce its data, collect() reports it with a HostInfo_Error record
+class CollectorError(Exception):
+    pass
+
+
+# Output formats: key='value' pairs (the default, what the Splunk field extractions expect), NDJSON and ArcSight CEF
+OUTPUT_FORMATS = ("kv", "json", "cef")
+CEF_HEADER = "CEF:0|HostInfo|hostinfo.py|1.0|{name}|{name}|1|"
+KV_ESCAPES = str.maketrans({"\\": "\\\\", "'": "\\'", "\n": "\\n", "\r": "\\r"})
+CEF_HEADER_ESCAPES = str.maketrans({"\\": "\\\\", "|": "\\|", "\n": " ", "\r": " "})
+CEF_ESCAPES = str.maketrans({"\\": "\\\\", "=": "\\=", "\n": "\\n", "\r": "\\r"})
+CEF_KEY = re.compile(r"\W")
+
+
+# Flatten a field value to text, a list is joined with '; ' like every multi-valued field has always been
+def field_text(value):
+    if isinstance(value, (list, tuple)):
+        return "; ".join(str(item) for item in value)
+    if value is None:
+        return ""
+    return str(value)
+
+
+# Writes records in one of OUTPUT_FORMATS, one pass over the fields into a buffer that is reused for every record
+class Serializer(object):
+    def __init__(self, format="kv"):
+        self.format = format
+        self.write_record = {"kv": self.write_kv, "json": self.write_json, "cef": self.write_cef}[format]
+        self.buffer = io.StringIO()
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def serialize(self, record):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.write_record(record, self.buffer.write)
+        return self.buffer.getvalue()
+
+    # Bytes one list item adds to a serialized message, separator included
+    def item_size(self, item):
+        if self.format == "json":
+            return len(self.encoder.encode(item).encode("utf-8")) + 1
+        escapes = CEF_ESCAPES if self.format == "cef" else KV_ESCAPES
+        return len(str(item).translate(escapes).encode("utf-8")) + 2
+
+    def write_kv(self, record, write):
+        separator = ""
+        for key, value in record.fields:
+            write(separator)
+            write(key)
+            write("='")
+            write(field_text(value).translate(KV_ESCAPES))
+            write("'")
+            separator = "; "
+
+    def write_json(self, record, write):
+        write(self.encoder.encode(dict(record.fields)))
+
+    def write_cef(self, record, write):
+        write(CEF_HEADER.format(name=record.name.translate(CEF_HEADER_ESCAPES)))
+        separator = ""
+        for key, value in record.fields:
+            write(separator)
+            write(CEF_KEY.sub("", key))
+            write("=")
+            write(field_text(value).translate(CEF_ESCAPES))
+            separator = " "
+
+
+# Rsyslog's default $MaxMessageSize is 8k, the budget leaves room for the syslog header and the logging prefix
+MESSAGE_BUDGET = 7680
+# Stand-in for the chunk index and total while measuring a chunk, as wide as any real value
+CHUNK_PLACEHOLDER = 999999
+
+
+# Split a record into messages of at most budget serialized bytes, packing list items on item boundaries.
+# Every chunk carries the record's other fields and is stamped with the run ID, section (the record name),
+# its index and the total so the chunks can be put back together; a single item larger than the budget is
+# sent alone in its own chunk rather than cut
+def chunk_record(record, serializer, budget, run_id):
+    lists = set(i for i, (key, value) in enumerate(record.fields) if isinstance(value, (list, tuple)))
+    stamp = [("HostInfo_Run", run_id), ("Section", record.name)]
+
+    def build(items, index, total):
+        fields = [(key, items.get(i, []) if i in lists else value) for i, (key, value) in enumerate(record.fields)]
+        return Record(record.name, stamp + [("Chunk", index), ("Chunks", total)] + fields)
+
+    room = budget - len(serializer.serialize(build({}, CHUNK_PLACEHOLDER, CHUNK_PLACEHOLDER)).encode("utf-8"))
+# Only the (start, end) span of every list in a chunk is kept, its items are sliced out when the chunk is built
+    chunks = []
+    spans = {}
+    used = 0
+    for i in sorted(lists):
+        start = 0
+        for position, item in enumerate(record.fields[i][1]):
+            size = serializer.item_size(item)
+            if used and used + size > room:
+                if position > start:
+                    spans[i] = (start, position)
+                chunks.append(spans)
+                spans = {}
+                used = 0
+                start = position
+            used += size
+        if len(record.fields[i][1]) > start:
+            spans[i] = (start, len(record.fields[i][1]))
+    chunks.append(spans)
+    for index, spans in enumerate(chunks, 1):
+        yield build(dict((i, record.fields[i][1][start:end]) for i, (start, end) in spans.items()), index, len(chunks))
+
+
+# Whether a field value (or a collector result) is a stream of items, a generator read as the items are sent,
+# rather than a list
+def is_stream(value):
+    return hasattr(value, "__next__")
+
+
+# Chunks a section as its items come: the one list field of a record is filled by add() and sent a chunk at a time,
+# so only the chunk being filled is held. The chunks are stamped like chunk_record()'s, except that the total is only
+# known once the items have run out: it is left empty on every chunk but the last
+class SectionWriter(object):
+    def __init__(self, outlet, record, field):
+        self.outlet = outlet
+        self.record = record
+        self.field = field
+        self.serializer = Serializer(outlet.format)
+        size = len(self.serializer.serialize(self.build([], CHUNK_PLACEHOLDER, CHUNK_PLACEHOLDER)).encode("utf-8"))
+        self.room = outlet.budget - size
+        self.items = []
+        self.used = 0
+        self.index = 0
+
+    def build(self, items, index, total):
+        fields = list(self.record.fields)
+        fields[self.field] = (fields[self.field][0], items)
+        return Record(self.record.name, [("HostInfo_Run", self.outlet.run_id), ("Section", self.record.name),
+                                         ("Chunk", index), ("Chunks", total)] + fields)
+
+    def add(self, item):
+        size = self.serializer.item_size(item)
+        if self.items and self.used + size > self.room:
+            self.flush("")
+        self.items.append(item)
+        self.used += size
+
+    def flush(self, total):
+        self.index += 1
+        self.outlet.send(self.record.name, self.serializer.serialize(self.build(self.items, self.index, total)))
+        self.items = []
+        self.used = 0
+
+    def close(self):
+        self.flush(self.index + 1)
+
+
+# Where the records of a run go: chunked, serialized, stamped with the run ID, led by the given fields and handed to
+# send (a transport's send(), or a list's append() to keep them). Collector threads write the sections they stream
+# while the main thread writes the others, so every write has a serializer of its own
+class Outlet(object):
+    def __init__(self, send, run_id=None, fields=()):
+        self.send_message = send
+        self.run_id = run_id or uuid.uuid4().hex
+        self.fields = list(fields)
+        self.format = OPTIONS.format
+        self.budget = OPTIONS.max_message_size
+        self.lock = threading.Lock()
+
+    # Hand one message of a section on, counting its bytes; a collector abandoned at its deadline stops here
+    def send(self, name, message):
+        cancel = getattr(_current, "cancel", None)
+        if cancel is not None and cancel.is_set():
+            raise CollectorError("abandoned at its deadline")
+        metrics_for(name).bytes += len(message.encode("utf-8"))
+        with self.lock:
+            self.send_message(message)
+
+    def write(self, record):
+        serializer = Serializer(self.format)
+        record = Record(record.name, self.fields + record.fields)
+        for chunk in chunk_record(record, serializer, self.budget, self.run_id):
+            self.send(record.name, serializer.serialize(chunk))
+
+    # SectionWriter for the section a record (whose list field is a stream) starts
+    def section(self, record):
+        record = Record(record.name, self.fields + record.fields)
+        field = next(i for i, (key, value) in enumerate(record.fields) if is_stream(value))
+        return SectionWriter(self, record, field)
+
+    # Send a record whose list field is a stream, as its items come
+    def write_stream(self, record):
+        writer = self.section(record)
+        for item in next(value for key, value in record.fields if is_stream(value)):
+            writer.add(item)
+        writer.close()
 
 
 # Define the Host Operating System, kernel version and date last updated
 def osinfo():
-        quikos = str(platform.dist())[1:-1]
-        quikos = quikos.replace("', '", "-")
-        bigos = str(platform.uname())[1:-1]
-        bigos = bigos.replace("name_result(", "")
-        bigos = bigos.replace("#1SMP", "")
-        bigos = bigos.replace(" ", "")
-        bigos = bigos.replace(",", "; ")
-        osinfo = quikos + "; " + bigos
-        return osinfo
+    if ROOT != '/':
+        return root_osinfo()
+    uname = platform.uname()
+    return Record("osinfo", [("OS", "-".join(platform.dist())), ("System", uname.system), ("Node", uname.node),
+                             ("Release", uname.release), ("Version", uname.version), ("Machine", uname.machine)])
 
 
 # Define the Host's machine name
 def hostname():
+    if ROOT != '/':
+        return root_hostname()
     hostname = platform.node()
     return hostname
 
-# Define the Host's currently installed applications and packages w/ version numbers and repos
-def apps():
-    apps_test = subprocess.call(["yum", "list", "installed"])
-    if apps_test == 0:
-        global apps, apps2
-        apps = subprocess.check_output(["yum", "list", "installed"]).decode("utf-8")
-        apps = re.sub(r"\n+", ";", apps)
-        apps = re.sub(r"\s+", "", apps)
-        apps = re.sub(r"\t+", "", apps)
-        apps = apps.replace(";", "; ")
-        apps = re.sub(r"(@.*?;)", ";", apps, flags=re.MULTILINE)
-        apps = apps.split(';')[4:]
-        apps = ";".join(apps)
-        apps = apps.replace(" ; ", " ")
-        apps2 = apps[:]
-        apps = apps[:len(apps) // 2]
-        apps = apps[1:]
-        apps = 'Installed_Packages1=' + "'" + apps + "'"
-        apps2 = apps2[len(apps2) // 2:]
-        apps2 = apps2[:-2]
-        apps2 = 'Installed_Packages2=' + "'" + apps2 + "'"
 
-    else:
-        apps, apps2 = "Error with 'yum list installed' command"
-    return apps, apps2
+OS_RELEASE = '/etc/os-release'
+REDHAT_RELEASE = '/etc/redhat-release'
+# "Red Hat Enterprise Linux Server release 7.9 (Maipo)"
+REDHAT_RELEASE_LINE = re.compile(r"^.*? release ([\d.]+)\s*(?:\((.*)\))?")
+# RHEL 6 keeps the host name in /etc/sysconfig/network, later releases in /etc/hostname
+ROOT_HOSTNAME_FILES = (('/etc/hostname', None), ('/etc/sysconfig/network', 'HOSTNAME'))
 
-# Define the Host time in UTC, ntp sync status, etc.
-def time():
-    try:
-        time_test = subprocess.call(["timedatectl"])
-        if time_test == 0:
-            time = subprocess.check_output(["timedatectl"]).decode("utf-8")
-            time = re.sub(r"\n", "; ", time)
-            time = time.replace(": ", "='")
-            time = time.replace("  ", "")
-            time = time.replace(" ", "_")
-            time = time.replace(";", "'; ")
-            time = time.replace(" _", " ")
-            time = time.replace(",_", ",")
-            time = time.split(";")
-            time = time[0:8]
-            time = ";".join(time)
-        else:
-            time = "Error with 'timedatectl' command"
-    except:
-        time_test2 = subprocess.call(["hwclock"])
-        if time_test2 == 0:
-            time = 'Time='
-            clocktime = subprocess.check_output(["hwclock"]).decode(sys.stdout.encoding).strip()
-            clocktime = "'" + clocktime + "'"
-            time += clocktime
-            str(time)
-            ntp_cmd = "ntpstat"
-            ntptimeout = subprocess.Popen([ntp_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True).communicate()[0]
-            ntptimeerr = subprocess.Popen([ntp_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True).communicate()[1]
-            ntptimeout = str(ntptimeout)
-            ntptimeout.rstrip()
-            ntptimeerr = str(ntptimeerr)
-            ntptimeerr.rstrip()
-            ntptimeout = ntptimeout.replace(" ", "_")
-            ntptimeout = ntptimeout.replace("__", " ")
-            if ntptimeout == '':
-                syncstat = "; NTP_synchronized='no'"
-                time += syncstat
+
+# Read KEY=value lines of a shell-style configuration file under ROOT (os-release, sysconfig), quotes removed
+def root_config(path):
+    config = {}
+    with open(root_path(path), encoding="utf-8", errors="replace") as file:
+        for line in file:
+            key, sep, value = line.strip().partition("=")
+            if sep and not key.startswith("#"):
+                config[key] = value.strip().strip("\"'")
+    return config
+
+
+# Host name of the system under ROOT, the root path's last component when the image has none
+def root_hostname():
+    for path, key in ROOT_HOSTNAME_FILES:
+        try:
+            if key is None:
+                with open(root_path(path), encoding="utf-8", errors="replace") as file:
+                    name = file.readline().strip()
             else:
-                time += ntptimeout
-        else:
-            time = "Error with 'hwclock' and 'ntpstat' commands"
-    return time
+                name = root_config(path).get(key, "")
+        except OSError:
+            continue
+        if name:
+            return name
+    return os.path.basename(ROOT.rstrip("/")) or ROOT
 
 
-# Define the Host's network interfaces
-def interfaces():
+# Operating system of the system under ROOT in platform.dist() form (redhat-7.9-Maipo) from /etc/redhat-release,
+# from /etc/os-release when there is none; the kernel fields describe the scanning host and are left out
+def root_osinfo():
     try:
-        interfaces = str(netifaces.interfaces())
-        interfaces = str(interfaces)[1:-1]
-        interfaces = interfaces.replace(" ", "")
-        interfaces = interfaces.replace("','", ",")
-    except NameError:
-        try:
-            interfaces = psutil.net_if_addrs()
-            interfaces = interfaces.keys()
-            interfaces = str(interfaces)
-            interfaces = str(interfaces)[11:-2]
-            interfaces = interfaces.replace("','", ",")
-            interfaces = interfaces.replace("', '", ",")
-# Including exception in case neither netifaces or psutil was available to be imported
-        except:
-            intf_cmd = "ifconfig | grep mtu | awk -F':' '{print $1}'"
-            interfaces = subprocess.Popen([intf_cmd], stdout=subprocess.PIPE,
-                                      stderr=subprocess.PIPE, universal_newlines=True, shell=True).communicate()[0]
-# Including the possibility of a Red Hat 6 host which has different ifconfig formatting
-            if interfaces == '':
-                rhel6_intf_cmd = "ifconfig | grep 'Link encap:' | awk '{print $1}'"
-                interfaces = subprocess.Popen([rhel6_intf_cmd], stdout=subprocess.PIPE,
-                                          stderr=subprocess.PIPE, universal_newlines=True,
-                                          shell=True).communicate()[0]
-            interfaces = str(interfaces)
-            interfaces = interfaces.splitlines()
-            interfaces = str(interfaces)[1:-1]
-            interfaces = interfaces.replace("','", ",")
-            interfaces = interfaces.replace("', '", ",")
-    return interfaces
+        with open(root_path(REDHAT_RELEASE), encoding="utf-8", errors="replace") as file:
+            match = REDHAT_RELEASE_LINE.match(file.readline())
+        release = ["redhat", match.group(1), match.group(2) or ""] if match else []
+    except OSError:
+        release = []
+    if not release:
+        try:
+            config = root_config(OS_RELEASE)
+            release = [config.get("ID", ""), config.get("VERSION_ID", ""), config.get("VERSION_CODENAME", "")]
+        except OSError:
+            raise CollectorError("Neither '{0}' nor '{1}' exist under {root}".format(REDHAT_RELEASE, OS_RELEASE, root=ROOT))
+    return Record("osinfo", [("OS", "-".join(release)), ("Node", hostname()), ("Root", ROOT)])
 
+# Installed package as recorded in the rpm database; repo is the yum repository it was installed from, when known
+Package = namedtuple("Package", ["name", "epoch", "version", "release", "arch", "repo"])
 
-# Define the Host's primary IP address
-def ipaddrpri():
-    ipaddrpri_cmd = r"hostname --all-ip-addresses | awk '{print $1}'"
-    ipaddrpri = subprocess.Popen([ipaddrpri_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                 encoding="utf-8", universal_newlines=True, shell=True).communicate()[0]
-    ipaddrpri = str(ipaddrpri)
-    ipaddrpri = ipaddrpri.rstrip()
-    return ipaddrpri
+# One rpm query returns every installed package, tab separated so no field needs re-parsing
+RPM_QUERYFORMAT = "%{NAME}\\t%{EPOCH}\\t%{VERSION}\\t%{RELEASE}\\t%{ARCH}\\n"
+YUMDB_PATH = '/var/lib/yum/yumdb'
+RPMDB = '/var/lib/rpm'
+# The package tables of the rpm database (Berkeley DB, and sqlite from RHEL 9), the only files of it that change only
+# when packages do: every rpm query, even 'rpm -qa', opens the __db.* region files and .dbenv.lock read-write
+RPMDB_PACKAGES = ("Packages", "rpmdb.sqlite")
 
 
-# Define the Host's full interface information
-def ifaddrall():
-    try:
-        ifaddrall = str(psutil.net_if_addrs())[1:-1]
-        ifaddrall = ifaddrall.replace("snicaddr(family=<AddressFamily.AF_INET: 2>, ", "")
-        ifaddrall = ifaddrall.replace("snicaddr(family=<AddressFamily.AF_PACKET: 17>, ", "")
-        ifaddrall = ifaddrall.replace("snicaddr(family=<AddressFamily.AF_INET6=10>, ", "")
-        ifaddrall = ifaddrall.replace("netmask='ffff:ffff:ffff:ffff::'", "")
-        ifaddrall = ifaddrall.replace("netmask='ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'", "")
-        ifaddrall = ifaddrall.replace("broadcast='ff:ff:ff:ff:ff:ff'", "")
-        ifaddrall = ifaddrall.replace(": ", "=")
-        ifaddrall = ifaddrall.replace("[", "{")
-        ifaddrall = ifaddrall.replace("]", "}")
-        ifaddrall = ifaddrall.replace(")", "")
-        ifaddrall = ifaddrall.replace(" ", "")
-        ifaddrall = ifaddrall.replace(",ptp=None", "")
-        ifaddrall = ifaddrall.replace(",broadcast=None", "")
-        ifaddrall = ifaddrall.replace(",netmask=None", "")
-    except NameError:
-        ifaddrall_err = " Error with psutil.net_if_addrs(), check if psutil version >= 3.0, only returning IP information"
-        ifaddrall_cmd = r"ip addr | for x in 'grep inet'; do echo $(awk -F'[ /]' '/inet /{print $6}'); done"
-        ifaddrall = subprocess.Popen([ifaddrall_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                     encoding="utf-8", universal_newlines=True, shell=True).communicate()[0]
-        ifaddrall = str(ifaddrall)
-        ifaddrall = ifaddrall.strip()
-        ifaddrall = ifaddrall.replace(" ", ",")
-        ifaddrall = "'" + ifaddrall + "'"
-        ifaddrall += ifaddrall_err
-    return ifaddrall
+# Parse the lines of 'rpm -qa --queryformat RPM_QUERYFORMAT' output (or of a captured dump) into Package records as they
+# are read, in rpm database order
+def parse_rpm_queryformat(lines, repos=None):
+    repos = repos or {}
+    for line in lines:
+        fields = line.rstrip("\n").split("\t")
+        if len(fields) != 5:
+            continue
+        name, epoch, version, release, arch = fields
+        if epoch == "(none)":
+            epoch = "0"
+        if arch == "(none)":
+            arch = "noarch"
+        repo = repos.get((name, version, release, arch), "")
+        yield Package(name, epoch, version, release, arch, repo)
 
 
-# Define the Host's mac addresses
-def macaddr():
+# Map (name, version, release, arch) to the repository yum recorded in its yumdb, without loading yum itself
+# (yumdb entries are named <letter>/<pkgid>-<name>-<version>-<release>-<arch>)
+def yumdb_repos(yumdb=YUMDB_PATH):
+    repos = {}
     try:
-        macaddr_cmd = r"ifconfig | grep ether | awk '{print $2}'"
-        macaddr = subprocess.Popen([macaddr_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8", universal_newlines=True, shell=True).communicate()[0]
-        macaddr = re.sub(r"\s+", ", ", macaddr)
-        macaddr = macaddr.strip()[:-1]
-        macaddr = "'" + macaddr + "'"
-# Including the possibility of a RedHat 6 host which has different ifconfig formatting
-        if macaddr == "''":
-            rhel6_mac_cmd = "ifconfig | grep HWaddr | awk '{print $5}'"
-            macaddr = subprocess.Popen([rhel6_mac_cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf-8", universal_newlines=True, shell=True).communicate()[0]
-            macaddr = macaddr.rstrip()
-            macaddr = "'" + macaddr + "'"
-    except:
-        macaddr = "'Error with macaddr function'"
-    return macaddr
+        letters = list(os.scandir(root_path(yumdb)))
+    except OSError:
+        return repos
+    for letter in letters:
+        try:
+            entries = list(os.scandir(letter.path))
+        except OSError:
+            continue
+        for entry in entries:
+            nvra = entry.name.split("-", 1)[-1].rsplit("-", 3)
+            if len(nvra) != 4:
+                continue
+            try:
+                with open(os.path.join(entry.path, "from_repo"), encoding="utf-8") as file:
+                    repos[tuple(nvra)] = file.read().strip()
+            except OSError:
+                continue
+    return repos
 
 
-# Define the Serial Number, Asset Tag (if tagged), Manufacturer, Make/Model and BIOS information
-def hwinfo():
-    a = "Vendor:"
-    b = "Version:"
-    c = "Release Date:"
-    d = "BIOS Revision:"
-    e = "Firmware Revision:"
-    f = "Manufacturer:"
-    g = "Product Name:"
-    h = "Serial Number:"
-    i = "UUID:"
-    j = "Serial Number:"
-    k = "Asset Tag:"
-    worthless = "Not Specified"
-    try:
-    # some organizations dump dmidecode data into a file like /etc/dmidump on a regular basis
-        with open('/etc/dmidump', encoding="utf-8") as file:
-            hwinfo1 = file.read()
-            file.close()
-            hwinfo1 = hwinfo1.splitlines()
-            hwinfo = []
-            for line in hwinfo1:
-                if line not in hwinfo:
-                    if worthless in line:
-                        continue
-                    if a in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if b in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if c in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if d in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if e in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if f in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if g in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if h in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if i in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-                    if k in line:
-                        if line not in hwinfo:
-                            hwinfo.append(line)
-            hwinfo = ''.join(hwinfo)
-            hwinfo = hwinfo.replace("\n", "")
-            hwinfo = hwinfo[1:]
-            hwinfo = hwinfo.replace("\t", ";")
-            hwinfo = hwinfo.replace(" ", "")
-            hwinfo = hwinfo.replace(":", "='")
-            hwinfo = hwinfo.replace(";", "'; ")
-            hwinfo = hwinfo + "'"
-    except:
-        hwinfo_test = subprocess.call(["dmidecode --type 0,1,3"], shell=True)
-        if hwinfo_test == 0:
-            hwinfo1 = subprocess.check_output(["dmidecode --type 0"], shell=True).decode("utf-8")
-            hwinfo1 = hwinfo1.splitlines()
-            hwinfo = []
-            for line in hwinfo1:
-                if worthless in line:
-                    continue
-                if a in line:
-                    hwinfo.append(line)
-                if c in line:
-                    hwinfo.append(line)
-                if d in line:
-                    hwinfo.append(line)
-                if e in line:
-                    hwinfo.append(line)
-            hwinfo2 = subprocess.check_output(["dmidecode --type 1"], shell=True).decode("utf-8")
-            hwinfo2 = hwinfo2.splitlines()
-            for line in hwinfo2:
-                if worthless in line:
-                    continue
-                if b in line:
-                    hwinfo.append(line)
-                if f in line:
-                    hwinfo.append(line)
-                if g in line:
-                    hwinfo.extend(line)
-                if h in line:
-                    hwinfo.extend(line)
-                if i in line:
-                    hwinfo.append(line)
-            hwinfo3 = subprocess.check_output(["dmidecode --type 3"], shell=True).decode("utf-8")
-            hwinfo3 = hwinfo3.splitlines()
-            for line in hwinfo3:
-                if worthless in line:
-                    continue
-                if k in line:
-                    hwinfo.append(line)
-            hwinfo = ''.join(hwinfo)
-            hwinfo = hwinfo.replace("\n", "")
-            hwinfo = hwinfo[1:]
-            hwinfo = hwinfo.replace("\t", ";")
-            hwinfo = hwinfo.replace(" ", "")
-            hwinfo = hwinfo.replace(":", "='")
-            hwinfo = hwinfo.replace(";", "'; ")
-            hwinfo = hwinfo + "'"
-        else:
-            hwinfo = "'/etc/dmidump' does not exist on {hostname} and error with the 'dmidecode --type 0,1,3' command".format(hostname=hostname)
-    return hwinfo
+# Define the Host's installed packages straight from the rpm database with a single rpm query
+# (of the image's database under ROOT, through --dbpath, which unlike --root needs no chroot). The query's output is
+# spooled once per run and every call streams the packages from it
+def packages():
+    argv = ["rpm", "-qa", "--queryformat", RPM_QUERYFORMAT]
+    if ROOT != '/':
+        argv[1:1] = ["--dbpath", root_path(RPMDB)]
+    rpm_cmd = spool_command(argv)
+    if rpm_cmd.returncode != 0:
+        return None
+    return parse_rpm_queryformat(spooled_lines(rpm_cmd), yumdb_repos())
 
 
-# Define the current open ports on the host
-def netstat():
-    netstat_test = subprocess.call(["netstat", "-noplv", "--inet"])
-    if netstat_test == 0:
-        netstat = subprocess.check_output(["netstat", "-noplv", "--inet"]).decode("utf-8")
-        netstat = re.sub(r"^\bnetstat: no support\b.*\n+", " ", netstat, flags=re.MULTILINE)
-        netstat = netstat[43:]
-        netstat = re.sub(r"\n", ";", netstat)
-        netstat = netstat.replace("\\n", "")
-        netstat = re.sub(r"\t", "", netstat)
-        netstat = re.sub(r"\s+", " ", netstat)
-        netstat = netstat.replace("  ", "")
-        netstat = netstat.replace(";", "; ")
-        netstat = netstat[:-2]
-        netstat = netstat.strip()
-        netstat = "Active_Sockets=" + "'" + netstat + "'"
-    else:
-        netstat = "Error with 'netstat -noplv --inet' command"
-    return netstat
+# Format a package as name-[epoch:]version-release.arch, followed by @repo when the repository is known
+def nevra(package):
+    epoch = package.epoch + ":" if package.epoch != "0" else ""
+    nevra = "{p.name}-{epoch}{p.version}-{p.release}.{p.arch}".format(p=package, epoch=epoch)
+    if package.repo:
+        nevra += "@" + package.repo
+    return nevra
 
 
-# Define the current status of SELinux (enabled / disabled / permissive /enforcing)
-def sestatus():
-    sestatus_test = subprocess.call(["sestatus"])
-    if sestatus_test == 0:
-        sestatus = subprocess.check_output(["sestatus"]).decode("utf-8")
-        sestatus = re.sub(r"\s+", " ", sestatus, flags=re.MULTILINE)
-        sestatus = sestatus.strip()
-        sestatus = sestatus.replace(": ", "='")
-        sestatus = sestatus.replace(" ", "")
-        sestatus = sestatus.replace("SELinuxfsmount", "', SELinuxfsmount")
-        sestatus = sestatus.replace("Currentmode", "', Currentmode")
-        sestatus = sestatus.replace("Modefromconfigfile", "', Modefromconfigfile")
-        sestatus = sestatus.replace("Policyversion", "', Policyversion")
-        sestatus = sestatus.replace("Policyfromconfigfile", "', Policyfromconfigfile")
-        sestatus = sestatus.replace("SELinuxrootdirectory", "', SELinuxrootdirectory")
-        sestatus = sestatus.replace("Loadedpolicyname", "', Loadedpolicyname")
-        sestatus = sestatus.replace("PolicyMLSstatus", "', PolicyMLSstatus")
-        sestatus = sestatus.replace("Policydeny_unknownstatus", "', Policydeny_unknownstatus")
-        sestatus = sestatus.replace("Maxkernelpolicyversion", "', Maxkernelpolicyversion")
-        sestatus = sestatus + "'"
-    else:
-        sestatus = str("Error_with_'sestatus'")
-    return sestatus
+# Define the Host's currently installed applications and packages w/ version numbers and repos
+def apps():
+    installed = packages()
+    if installed is None:
+        raise CollectorError("Error with 'rpm -qa' command")
+    return (nevra(package) for package in installed)
 
 
-# Define all user accounts on the host
-def user_accounts():
-    with open('/etc/passwd', 'r') as file:
-        search_string = "nologin"
-        accounts = ''
-        for line in file:
-            if search_string not in line:
-                accounts += line
-        accounts = re.sub(r"^\bsync\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\bshutdown\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\bhalt\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\broot\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\s+\bsync\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\s+\bshutdown\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\s+\bhalt\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = re.sub(r"^\s+\broot\b.*\n+", " ", accounts, flags=re.MULTILINE)
-        accounts = accounts.replace("\n", ";")
-        accounts = accounts.replace("\\n", "")
-        accounts = accounts.replace("\t", "")
-        accounts = accounts.replace(" ", "")
-        accounts = accounts.replace(";", "; ")
-        accounts = accounts[:-2]
-        accounts = accounts.strip()
-        file.close()
-        return accounts
+# rpm version segments: runs of digits, runs of letters, and the '~' (sorts before anything, even the end) and
+# '^' (sorts after the end, before anything else) markers; every other character only separates segments
+RPM_SEGMENT = re.compile(r"[0-9]+|[A-Za-z]+|[~^]")
 
 
-# Define all user monikers for accounts on the host
-def monikers():
-    with open('/etc/passwd', 'r') as file:
-        search_string = "nologin"
-        a = "sync"
-        b = "shutdown"
-        c = "halt"
-        d = "root"
-        accounts = ''
-        monikers = []
-        for line in file:
-            if search_string not in line:
-                accounts += line
-        for line in accounts.splitlines():
-            word = line.split(':x:')
-            word = [word[0]]
-            if a in word:
-                continue
-            if b in word:
-                continue
-            if c in word:
+# Compare two version (or release) strings with rpm's rpmvercmp() semantics: -1, 0 or 1
+def rpm_vercmp(a, b):
+    if a == b:
+        return 0
+    one = RPM_SEGMENT.findall(a)
+    two = RPM_SEGMENT.findall(b)
+    for i in range(max(len(one), len(two))):
+        x = one[i] if i < len(one) else None
+        y = two[i] if i < len(two) else None
+        if x == "~" or y == "~":
+            if x != "~":
+                return 1
+            if y != "~":
+                return -1
+            continue
+        if x == "^" or y == "^":
+            if x is None:
+                return -1
+            if y is None:
+                return 1
+            if x != "^":
+                return 1
+            if y != "^":
+                return -1
+            continue
+        if x is None or y is None:
+            return -1 if x is None else 1
+        if x[0].isdigit():
+            if not y[0].isdigit():
+                return 1
+            x = x.lstrip("0")
+            y = y.lstrip("0")
+            if len(x) != len(y):
+                return 1 if len(x) > len(y) else -1
+        elif y[0].isdigit():
+            return -1
+        if x != y:
+            return 1 if x > y else -1
+    return 0
+
+
+# Split an [epoch:]version-release string into an (epoch, version, release) tuple, epoch 0 when there is none
+def parse_evr(evr):
+    epoch, sep, rest = evr.partition(":")
+    if not sep:
+        epoch, rest = "0", evr
+    version, sep, release = rest.rpartition("-")
+    if not sep:
+        version, release = release, ""
+    return (int(epoch) if epoch.isdigit() else 0, version, release)
+
+
+# Compare two (epoch, version, release) tuples the way rpm orders packages: -1, 0 or 1
+def evr_compare(a, b):
+    if a[0] != b[0]:
+        return 1 if a[0] > b[0] else -1
+    return rpm_vercmp(a[1], b[1]) or rpm_vercmp(a[2], b[2])
+
+
+# Offline advisory feeds copied to the host (yum updateinfo.xml or Red Hat OVAL, optionally gzip or bzip2 compressed),
+# the first of these that exists is used unless --advisories names one
+ADVISORY_FEEDS = ('/var/lib/hostinfo/updateinfo.xml.gz', '/var/lib/hostinfo/updateinfo.xml',
+                  '/var/lib/hostinfo/oval.xml.bz2', '/var/lib/hostinfo/oval.xml')
+# Advisory types of updateinfo.xml that fix vulnerabilities
+ADVISORY_TYPES = ("security",)
+OVAL_LESS_THAN = "less than"
+
+
+# Local name of a (possibly namespaced) XML tag
+def local_tag(tag):
+    return tag.rpartition("}")[2]
+
+
+# Open an advisory feed, decompressing .gz and .bz2 files on the fly
+def open_feed(path):
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        import bz2
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+# Stream an advisory feed into {package name: {(fixed evr, advisory)}}: every package at an EVR lower than the fixed one
+# is affected by the advisory ("RHSA-2020:1234 Important"). updateinfo.xml lists the fixed packages of each
+# <update>; OVAL definitions reference rpminfo tests whose object is the package name and whose state is
+# "evr less than" the fixed EVR (the other tests of a definition, release and signature checks, are not needed
+# to match packages). Every element is cleared once it has been read so memory stays flat
+def parse_advisory_feed(path):
+    etree = optional_import("lxml.etree")
+    file = open_feed(path)
+    if etree is not None:
+        events = etree.iterparse(file, events=("start", "end"), resolve_entities=False, no_network=True)
+    else:
+        import xml.etree.ElementTree as etree
+        events = etree.iterparse(file, events=("start", "end"))
+    fixes = {}
+    definitions = []
+    tests = {}
+    objects = {}
+    states = {}
+    stack = []
+    with file:
+        for event, element in events:
+            if event == "start":
+                stack.append(element)
                 continue
-            if d in word:
+            stack.pop()
+            tag = local_tag(element.tag)
+            if tag == "update":
+                if element.get("type", "security") in ADVISORY_TYPES:
+                    advisory = " ".join(filter(None, [element.findtext("id"), element.findtext("severity")]))
+                    for package in element.iter("package"):
+                        evr = "{0}:{1}-{2}".format(package.get("epoch") or "0", package.get("version"), package.get("release"))
+                        fixes.setdefault(package.get("name"), set()).add((evr, advisory))
+            elif tag == "definition":
+                advisory = element.get("id")
+                severity = ""
+                refs = []
+                for child in element.iter():
+                    child_tag = local_tag(child.tag)
+                    if child_tag == "reference" and child.get("source") in ("RHSA", "RHBA", "RHEA"):
+                        advisory = child.get("ref_id")
+                    elif child_tag == "severity":
+                        severity = child.text or ""
+                    elif child_tag == "criterion":
+                        refs.append(child.get("test_ref"))
+                definitions.append((" ".join(filter(None, [advisory, severity])), refs))
+            elif tag == "rpminfo_test":
+                refs = dict((local_tag(child.tag), child.get(local_tag(child.tag) + "_ref")) for child in element)
+                tests[element.get("id")] = (refs.get("object"), refs.get("state"))
+            elif tag == "rpminfo_object":
+                objects[element.get("id")] = "".join(child.text or "" for child in element if local_tag(child.tag) == "name")
+            elif tag == "rpminfo_state":
+                for child in element:
+                    if local_tag(child.tag) == "evr" and child.get("operation") == OVAL_LESS_THAN:
+                        states[element.get("id")] = child.text
+            else:
                 continue
+            element.clear()
+            if stack:
+                del stack[-1][:]
+    for advisory, refs in definitions:
+        for ref in refs:
+            object_ref, state_ref = tests.get(ref, (None, None))
+            if object_ref in objects and state_ref in states:
+                fixes.setdefault(objects[object_ref], set()).add((states[state_ref], advisory))
+    return fixes
+
+
+# Compiled advisory index, memory-mapped so a run only touches the pages of the packages it looks up:
+#   header: magic, key length, name count, names length, entry count, strings length
+#   key: JSON [feed path, mtime_ns, size] of the feed it was compiled from
+#   names: the package names, sorted and newline separated
+#   table: (first entry, entry count) per name
+#   entries: (evr offset, evr length, advisory offset, advisory length) into strings, sorted by fixed EVR per name
+#   strings: the EVRs and advisories, each stored once
+ADVISORY_INDEX = 'advisories.idx'
+ADVISORY_INDEX_MAGIC = b"HIADV001"
+ADVISORY_HEADER = struct.Struct("!8sIIIII")
+ADVISORY_TABLE = struct.Struct("!II")
+ADVISORY_ENTRY = struct.Struct("!IHIH")
+
+
+# Compile the fixes of a feed into an index file, written atomically like the cache entries
+def write_advisory_index(path, key, fixes):
+    names = sorted(name for name in fixes if name)
+    name_count = len(names)
+    by_evr = functools.cmp_to_key(evr_compare)
+    strings = io.BytesIO()
+    offsets = {}
+
+    def string(text):
+        data = text.encode("utf-8")[:0xffff]
+        if data not in offsets:
+            offsets[data] = strings.tell()
+            strings.write(data)
+        return offsets[data], len(data)
+
+    table = io.BytesIO()
+    entries = io.BytesIO()
+    count = 0
+    for name in names:
+        fixed = sorted(fixes[name], key=lambda fix: (by_evr(parse_evr(fix[0])), fix[1]))
+        table.write(ADVISORY_TABLE.pack(count, len(fixed)))
+        for evr, advisory in fixed:
+            entries.write(ADVISORY_ENTRY.pack(*(string(evr) + string(advisory))))
+        count += len(fixed)
+    key = json.dumps(key).encode("utf-8")
+    names = "\n".join(names).encode("utf-8")
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".advisories")
+    with os.fdopen(fd, "wb") as file:
+        file.write(ADVISORY_HEADER.pack(ADVISORY_INDEX_MAGIC, len(key), name_count, len(names), count, strings.tell()))
+        for section in (key, names, table.getvalue(), entries.getvalue(), strings.getvalue()):
+            file.write(section)
+    os.replace(tmp, path)
+
+
+# Memory-mapped advisory index; only the sorted name list is decoded when it is opened
+class AdvisoryIndex(object):
+    def __init__(self, path):
+        import mmap
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key_len, name_count, names_len, entry_count, strings_len = ADVISORY_HEADER.unpack_from(self.map)
+        if magic != ADVISORY_INDEX_MAGIC:
+            self.map.close()
+            raise ValueError("{0} is not an advisory index".format(path))
+        offset = ADVISORY_HEADER.size
+        self.key = json.loads(self.map[offset:offset + key_len].decode("utf-8"))
+        offset += key_len
+        self.names = self.map[offset:offset + names_len].decode("utf-8").split("\n") if names_len else []
+        self.table = offset + names_len
+        self.entries = self.table + len(self.names) * ADVISORY_TABLE.size
+        self.strings = self.entries + entry_count * ADVISORY_ENTRY.size
+
+    def entry(self, i):
+        evr_off, evr_len, advisory_off, advisory_len = ADVISORY_ENTRY.unpack_from(self.map, self.entries + i * ADVISORY_ENTRY.size)
+        evr = self.map[self.strings + evr_off:self.strings + evr_off + evr_len].decode("utf-8")
+        advisory = self.map[self.strings + advisory_off:self.strings + advisory_off + advisory_len].decode("utf-8")
+        return evr, advisory
+
+    # (fixed evr, advisory) of every advisory the installed package is older than: the entries of a name are sorted
+    # by fixed EVR, so a patched package costs one comparison (with the newest fix) and the rest a binary search
+    def matches(self, package):
+        i = bisect.bisect_left(self.names, package.name)
+        if i == len(self.names) or self.names[i] != package.name:
+            return []
+        first, count = ADVISORY_TABLE.unpack_from(self.map, self.table + i * ADVISORY_TABLE.size)
+        installed = (int(package.epoch) if package.epoch.isdigit() else 0, package.version, package.release)
+        lo, hi = first, first + count
+        if evr_compare(parse_evr(self.entry(hi - 1)[0]), installed) <= 0:
+            return []
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if evr_compare(parse_evr(self.entry(mid)[0]), installed) <= 0:
+                lo = mid + 1
             else:
-                monikers.extend(word)
-        monikers = str(monikers)[1:-1]
-        monikers = monikers.replace("', '", "; ")
-        file.close()
-        return monikers
-
-
-# Define all non-enterprise accounts (note: requires the enterprise account list to be in xml in a directory available to the local host)
-#def inspect_accounts():
-# Check for one of 2 different filepaths and determine the appropriate directory to pull user information from
-# These filepaths must match your organizational environment in order to use this function
-#    if os.path.isfile('/usr/local/share/fakepath.xml') == True: 
-        # specify first filepath
-#        userspath = '/usr/local/share/fakepath.xml'
-#    elif os.path.isfile('/etc/sysconfig/fakepath.xml') == True:
-        # specify second filepath
-#        userspath = '/etc/sysconfig/fakepath.xml'
-#    else:
-#        non_org_users = []
-#        with open('/etc/passwd', 'r') as file7:
-#            search_string = "nologin"
-#            for line in file7:
-#                if search_string not in line:
-#                    a = "sync"
-#                    b = "shutdown"
-#                    c = "halt"
-#                    d = "root"
-#                    if a not in line:
-#                        if b not in line:
-#                            if c not in line:
-#                                if d not in line:
-#                                    line.splitlines()
-#                                    word = line.split(':x:')
-#                                    word = [word[0]]
-#                                    non_org_users.extend(word)
-#                                else:
-#                                   continue
-#                            else:
-#                                continue
-#                        else:
-#                            continue
-#                    else:
-#                        continue
-#        file7.close()
-#        non_org_users.append(r"Confirm that {hostname}=NON-ORGANIZATIONAL_host: error finding the fakepath.xml prevents parsing non-org-users".format(hostname=hostname()))
-#        return non_org_users
-#    with open(userspath, 'r') as file:
-#        org_users = []
-#        non_org_users = []
-#        xml = file.read()
-#        root = etree.fromstring(xml)
-#        for user in root.getchildren():
-#            for username in user.getchildren():
-#                if username.tag == "username":
-#                    org_users += [username.text]
-#        with open('/etc/passwd', 'r') as file2:
-#            search_string = "nologin"
-#            for line in file2:
-#                if search_string not in line:
-#                    line.splitlines()
-#                    word = line.split(':x:')
-#                    word = [word[0]]
-#                    moniker = np.setdiff1d(word,org_users,assume_unique=False).tolist()
-#                    moniker = list(moniker)
-#                    if moniker not in non_org_users:
-#                        non_org_users.extend(moniker)
-#            non_org_users2 = ''
-#            a = "sync"
-#            b = "shutdown"
-#            c = "halt"
-#            d = "root"
-#            for item in non_org_users:
-#                if a == item:
-#                    continue
-#                if b == item:
-#                    continue
-#                if c == item:
-#                    continue
-#                if d == item:
-#                    continue
-#                if item != []:
-#                    item = item + '; '
-#                    non_org_users2 += item
-#            non_org_users2 = non_org_users2[:-2]
-#            if non_org_users2 == '':
-#                non_org_users2 = "{hostname}'s /etc/passwd entries match the organizational listing".format(hostname=hostname())
-#        file2.close()
-#    file.close()
-#    return non_org_users2
+                hi = mid
+        return [self.entry(j) for j in range(lo, first + count)]
 
 
-# Define all service accounts on the host
-def service_accounts():
-    with open('/etc/passwd', 'r') as file3:
-        search_string = "nologin"
-        accounts = ''
-        for line in file3:
-            if search_string in line:
-                accounts += line
-            a = "root"
-            b = "sync"
-            c = "shutdown"
-            d = "halt"
-            if a in line:
-                accounts += line
-            if b in line:
-                accounts += line
-            if c in line:
-                accounts += line
-            if d in line:
-                accounts += line
-        accounts = accounts.replace("\n", ";")
-        accounts = accounts.replace("\\n", "")
-        accounts = accounts.replace("\t", "")
-        accounts = accounts.replace(" ", "")
-        accounts = accounts.replace(";", "; ")
-        accounts = accounts[:-2]
-        accounts = accounts.strip()
-        accounts = "'" + accounts + "'"
-        file3.close()
-        return accounts
+# Advisory indexes opened in this process keyed on feed path; a worker process of --root inherits the parent's
+_advisory_indexes = {}
+_advisory_indexes_lock = threading.Lock()
 
 
-# Define the sudoers privileges on the host
-# Note that some organizations may use multiple sudoers files so we need to consider more than just /etc/sudoers
-def sudoers():
+# The feed --advisories names, else the first of ADVISORY_FEEDS that exists (None when there is none)
+def advisory_feed():
+    if OPTIONS.advisories:
+        return OPTIONS.advisories
+    return next((path for path in ADVISORY_FEEDS if os.path.isfile(path)), None)
+
+
+# Open the index of a feed, compiling it first when the index on disk was built from another version of the feed
+def advisory_index(feed):
+    stat = os.stat(feed)
+    key = [os.path.abspath(feed), stat.st_mtime_ns, stat.st_size]
+    with _advisory_indexes_lock:
+        index = _advisory_indexes.get(feed)
+        if index is not None and index.key == key:
+            return index
+        if index is not None:
+            index.map.close()
+        path = os.path.join(CACHE_DIR, ADVISORY_INDEX)
+        index = None
+        if cache_enabled():
+            try:
+                index = AdvisoryIndex(path)
+            except (OSError, ValueError, struct.error):
+                index = None
+        if index is None or index.key != key:
+            if index is not None:
+                index.map.close()
+# Without the cache the index is compiled to a file of this process only, removed once mapped
+            if not cache_enabled():
+                path = os.path.join(CACHE_DIR, ".{0}.{1}".format(ADVISORY_INDEX, os.getpid()))
+            write_advisory_index(path, key, parse_advisory_feed(feed))
+            index = AdvisoryIndex(path)
+            if not cache_enabled():
+                os.unlink(path)
+        _advisory_indexes[feed] = index
+        return index
+
+
+# Define the installed packages affected by an advisory of the offline feed, one "package advisory severity fixed_in=evr"
+# item per vulnerable package/advisory pair, so the version matching is not left to a search over every host's packages
+def vulnerabilities():
+    feed = advisory_feed()
+    if feed is None:
+        return Record("vulnerabilities", [("Vulnerable_Packages", []), ("Note", "No advisory feed on {hostname} ({feeds})".format(hostname=hostname(), feeds=", ".join(ADVISORY_FEEDS)))])
+    installed = packages()
+    if installed is None:
+        raise CollectorError("Error with 'rpm -qa' command")
+    index = advisory_index(feed)
+    pairs = ("{0} {1} fixed_in={2}".format(nevra(package), advisory, evr)
+             for package in installed for evr, advisory in index.matches(package))
+    return Record("vulnerabilities", [("Vulnerable_Packages", pairs), ("Advisory_Feed", feed)])
+
+# struct timex from <sys/timex.h> as laid out by glibc
+class Timex(ctypes.Structure):
+    _fields_ = [("modes", ctypes.c_uint), ("offset", ctypes.c_long), ("freq", ctypes.c_long),
+                ("maxerror", ctypes.c_long), ("esterror", ctypes.c_long), ("status", ctypes.c_int),
+                ("constant", ctypes.c_long), ("precision", ctypes.c_long), ("tolerance", ctypes.c_long),
+                ("time_sec", ctypes.c_long), ("time_usec", ctypes.c_long), ("tick", ctypes.c_long),
+                ("ppsfreq", ctypes.c_long), ("jitter", ctypes.c_long), ("shift", ctypes.c_int),
+                ("stabil", ctypes.c_long), ("jitcnt", ctypes.c_long), ("calcnt", ctypes.c_long),
+                ("errcnt", ctypes.c_long), ("stbcnt", ctypes.c_long), ("tai", ctypes.c_int),
+                ("padding", ctypes.c_int * 11)]
+
+
+# Kernel clock state as returned by adjtimex(2); offsets and errors in microseconds
+ClockState = namedtuple("ClockState", ["synchronized", "offset_us", "maxerror_us", "esterror_us", "time_sec"])
+TIME_ERROR = 5
+STA_UNSYNC = 0x0040
+STA_NANO = 0x2000
+
+# Local time daemon endpoints: chronyd's command port and ntpd's control (mode 6) port
+CHRONYD_ADDRESS = ("127.0.0.1", 323)
+NTPD_ADDRESS = ("127.0.0.1", 123)
+TIME_DAEMON_TIMEOUT = 1.0
+
+# Time daemon's view of its synchronization source; offset in milliseconds
+TimeSource = namedtuple("TimeSource", ["daemon", "source", "stratum", "offset_ms", "leap"])
+
+# chronyd command protocol (candm.h): request and reply headers, REQ_TRACKING and its reply payload
+CHRONY_PROTO_VERSION = 6
+CHRONY_REQ_TRACKING = 33
+CHRONY_RPY_TRACKING = 5
+CHRONY_REQUEST = struct.Struct("!BBBBHHIII")
+CHRONY_REPLY = struct.Struct("!BBBBHHHHHHIII")
+CHRONY_TRACKING = struct.Struct("!I16sHHHHIII9I")
+CHRONY_LEAP = {0: "normal", 1: "insert_second", 2: "delete_second", 3: "unsynchronized"}
+
+# NTP control message (RFC 1305 appendix B) header, READVAR of the system variables
+NTP_CONTROL = struct.Struct("!BBHHHHH")
+NTP_CONTROL_READVAR = 2
+NTP_CONTROL_MORE = 0x20
+NTP_CONTROL_ERROR = 0x40
+NTP_VARIABLE = re.compile(r'\s*([\w.]+)=("[^"]*"|[^,]*)')
+
+
+# Read the kernel clock synchronization state with a read-only adjtimex(2) call, no subprocess or RTC access
+def adjtimex():
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    timex = Timex()
+    state = libc.adjtimex(ctypes.byref(timex))
+    if state < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    scale = 1000 if timex.status & STA_NANO else 1
+    return ClockState(state != TIME_ERROR and not timex.status & STA_UNSYNC, timex.offset / scale,
+                      timex.maxerror, timex.esterror, timex.time_sec)
+
+
+# chronyd's 32-bit float: 7-bit signed exponent and 25-bit signed coefficient
+def chrony_float(value):
+    exponent = value >> 25
+    if exponent >= 1 << 6:
+        exponent -= 1 << 7
+    coefficient = value % (1 << 25)
+    if coefficient >= 1 << 24:
+        coefficient -= 1 << 25
+    return coefficient * 2.0 ** (exponent - 25)
+
+
+# Ask chronyd for its tracking state over its local command port (what 'chronyc tracking' shows)
+def chrony_tracking(address=CHRONYD_ADDRESS, timeout=TIME_DAEMON_TIMEOUT):
+    sequence = random.getrandbits(32)
+    request = CHRONY_REQUEST.pack(CHRONY_PROTO_VERSION, 1, 0, 0, CHRONY_REQ_TRACKING, 0, sequence, 0, 0)
+# chronyd drops requests shorter than the reply they ask for
+    request += bytes(CHRONY_REPLY.size + CHRONY_TRACKING.size - len(request))
+    sock = socket.socket(socket.AF_INET6 if ":" in address[0] else socket.AF_INET, socket.SOCK_DGRAM)
     try:
-        sudoers_flist = []
-        for file in glob.glob('/etc/sudoers.d/*'):
-            sudoers_flist.append(file)
-        for file in sudoers_flist:
-            file = file.rstrip()
-            with open(file, 'r', encoding='utf-8') as sudoers10, open('/etc/temp.txt', 'a+', encoding='utf-8') as sudoersout:
-                sudoers10 = sudoers10.read()
-                sudoersout.write(sudoers10)
-        with open('/etc/sudoers', 'r', encoding='utf-8') as sudoers1, open('/etc/temp.txt', 'a+', encoding='utf-8') as sudoersout:
-            sudoers1 = sudoers1.read()
-            sudoersout.write(sudoers1)
-        with open('/etc/temp.txt', 'r', encoding='utf-8') as sudoersout:
-            sudoers = sudoersout.read()
-    except FileNotFoundError:
-        with open('/etc/sudoers', 'r', encoding="utf-8") as file6:
-            sudoers = file6.read()
-            file6.close()
+        sock.settimeout(timeout)
+# Connected, so the ICMP port unreachable of a host without chronyd fails the recv at once instead of the timeout
+        sock.connect(address)
+        sock.send(request)
+        reply = sock.recv(1024)
     finally:
-        sudoers = re.sub(r'(?m)^ *#.*\n?', '', sudoers, flags=re.MULTILINE)
-        sudoers = re.sub(r'^\bDefaults\b.*\n', '', sudoers, flags=re.MULTILINE)
-        sudoers = re.sub(r'^\bDEFAULT\b.*\n', '', sudoers, flags=re.MULTILINE)
-        sudoers = re.sub(r'^$\n', '', sudoers, flags=re.MULTILINE)
-        sudoers = sudoers.replace(" ", "")
-        sudoers = sudoers.replace("\n", "; ")
-        sudoers = sudoers.replace("\\n", "")
-        sudoers = sudoers.replace("ALL", "")
-        sudoers = sudoers.replace("ALL=(ALL)", "")
-        sudoers = sudoers.replace("=()", "")
-        sudoers = sudoers.replace("\t", "")
-        sudoers = sudoers[0:-2]
-        sudoers = sudoers.replace("Host_Alias", "Host_Alias:")
-        sudoers = sudoers.strip()
-        sudoers = "'" + sudoers + "'"
-        return sudoers
+        sock.close()
+    if len(reply) < CHRONY_REPLY.size + CHRONY_TRACKING.size:
+        raise OSError("short reply from chronyd")
+    version, pkt_type, res1, res2, command, rpy, status = CHRONY_REPLY.unpack_from(reply)[:7]
+    if pkt_type != 2 or rpy != CHRONY_RPY_TRACKING or status != 0 or CHRONY_REPLY.unpack_from(reply)[10] != sequence:
+        raise OSError("unexpected reply from chronyd (status {0})".format(status))
+    fields = CHRONY_TRACKING.unpack_from(reply, CHRONY_REPLY.size)
+    ref_id, addr, family, pad, stratum, leap = fields[:6]
+    if family == 1:
+        source = socket.inet_ntop(socket.AF_INET, addr[:4])
+    elif family == 2:
+        source = socket.inet_ntop(socket.AF_INET6, addr)
+    else:
+        source = struct.pack("!I", ref_id).decode("ascii", "replace").strip("\x00")
+    last_offset = chrony_float(fields[10])
+    return TimeSource("chronyd", source, stratum, last_offset * 1000, CHRONY_LEAP.get(leap, str(leap)))
 
 
-# Define the age of the root password and compare its last-change-date to the frequency it is supposed to be changed
-# (every 180 days per NIST policy). 179 days is used here to ensure we have leeway to fix accounts and not violate the policy.
-def root_change():
-    root_test = subprocess.call(["chage", "-l", "root"])
-    if root_test == 0:
-        root_change = subprocess.check_output(["chage", "-l", "root"]).decode("utf-8")
-        root_change = str(root_change)
-        regex = r"(\w{3})+\s+([0-9]{2})+\,+\s+([0-9]{4})|$"
-        root_change = re.search(regex, root_change)
-        root_change = root_change.group(0)
-        root_change = root_change[:-2]
-        root_change = datetime.strptime(root_change, "%b %d, %y")
-        today = datetime.now()
-        if (root_change + timedelta(days = 179)) <= today:
-            root_change = "CHANGE_ROOT_PASSWORD, last_root_changed='{root_change}'".format(root_change=root_change)
-        else:
-            root_change = "Root_password_current, last_root_changed='{root_change}'".format(root_change=root_change)
+# Read ntpd's system variables with a mode 6 READVAR request to its local control port (what 'ntpq -c rv' shows)
+def ntpd_sysvars(address=NTPD_ADDRESS, timeout=TIME_DAEMON_TIMEOUT):
+    sequence = random.getrandbits(16)
+    sock = socket.socket(socket.AF_INET6 if ":" in address[0] else socket.AF_INET, socket.SOCK_DGRAM)
+    fragments = {}
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.send(NTP_CONTROL.pack(0x16, NTP_CONTROL_READVAR, sequence, 0, 0, 0, 0))
+        while True:
+            reply = sock.recv(2048)
+            mode, op, reply_sequence, status, assoc, offset, count = NTP_CONTROL.unpack_from(reply)
+            if reply_sequence != sequence:
+                continue
+            if op & NTP_CONTROL_ERROR:
+                raise OSError("ntpd refused the READVAR request")
+            fragments[offset] = reply[NTP_CONTROL.size:NTP_CONTROL.size + count]
+            if not op & NTP_CONTROL_MORE:
+                break
+    finally:
+        sock.close()
+    text = b"".join(fragments[offset] for offset in sorted(fragments)).decode("ascii", "replace")
+    sysvars = dict((key, value.strip().strip('"')) for key, value in NTP_VARIABLE.findall(text))
+    leap = {"00": "normal", "01": "insert_second", "10": "delete_second", "11": "unsynchronized"}
+    return TimeSource("ntpd", sysvars.get("refid", ""), int(sysvars.get("stratum", "16") or 16),
+                      float(sysvars.get("offset", "0") or 0), leap.get(sysvars.get("leap", ""), sysvars.get("leap", "")))
+
+
+# Whichever local time daemon answers first, chronyd then ntpd; None when neither is running
+def time_source():
+    for query in (chrony_tracking, ntpd_sysvars):
+        try:
+            return query()
+        except (OSError, ValueError, struct.error):
+            continue
+    return None
+
+
+# Only used when the kernel clock cannot be read and --hwclock was given: hwclock waits for the next RTC tick
+def hwclock_time():
+    hwclock_cmd = run_command(["hwclock"])
+    if hwclock_cmd.returncode != 0:
+        raise CollectorError("Error with 'hwclock' and 'ntpstat' commands")
+    time = Record("time", [("Time", hwclock_cmd.stdout.strip())])
+    ntpstat = run_command(["ntpstat"]).stdout.rstrip()
+    if ntpstat == '':
+        time.add("NTP_synchronized", "no")
     else:
-        root_change = "Error with the 'chage -l root' command"
-    return root_change
+        time.add("NTP_status", " ".join(ntpstat.split()))
+    return time
 
 
-# Build log entries and sends them to syslog
-def logs():
-# Define Messages
-    date_msg = "ISRHostInfo_LastSent='{date}'; OS={osinfo}".format(date=date, osinfo=osinfo())
-    apps()
-    apps_msg = "{apps}".format(apps=apps)
-    apps_msg2 = "{apps2}".format(apps2=apps2)
-    intf_msg = "Interface_Names={interfaces}; Primary_IP='{ipaddrpri}'; MAC_Address(es)={macaddr}".format(interfaces=interfaces(), ipaddrpri=ipaddrpri(), macaddr=macaddr())
-    addr_msg = "All_Interface_Address_Info=[{ifaddrall}]".format(ifaddrall=ifaddrall())
-    hw_msg = "{hwinfo}".format(hwinfo=hwinfo())
-    user_msg = "User_Accounts='{user_accounts}'".format(user_accounts=user_accounts())
-    moniker_msg = "Monikers={monikers}".format(monikers=monikers())
-    service_msg = "Service_Accounts={service_accounts}".format(service_accounts=service_accounts())
-    sudoers_msg = "Sudoers_Entries={sudoers}".format(sudoers=sudoers())
-# Add this once the the enterprise user list directory is input into inspect_accounts() 
-#    prop_msg = "Local_accountsORl33t_hackerz?='{inspect_accounts}'".format(inspect_accounts=inspect_accounts())
-
-
-# Define Logger and send Log Messages (should be sent via rsyslog to the centralized log host / Splunk and stored in /var/log/messages)
-    class SyslogFormatter(logging.Formatter):
-        def format(self, record):
-            result = super().format(record)
-            return "ufeff" + result
-    handler = logging.handlers.SysLogHandler('/dev/log', facility=syslog.LOG_AUTHPRIV)
-    formatter = SyslogFormatter(logging.BASIC_FORMAT)
-    handler.setFormatter(formatter)
-    isrhostlog = logging.getLogger()
-    isrhostlog.setLevel(os.environ.get("LOGLEVEL", "WARNING"))
-    isrhostlog.addHandler(handler)
-    logging.warning('%s', date_msg)
-    logging.warning('%s', apps_msg)
-    logging.warning('%s', apps_msg2)
-    logging.warning('%s', intf_msg)
-    logging.warning('%s', time())
-    logging.warning('%s', addr_msg)
-    logging.warning('%s', hw_msg)
-    logging.warning('%s', netstat())
-    logging.warning('%s', root_change())
-    logging.warning('%s', sestatus())
-    logging.warning('%s', user_msg)
-    logging.warning('%s', service_msg)
-    logging.warning('%s', sudoers_msg)
-    logging.warning('%s', moniker_msg)
-# Add this once the enterprise user list directory is input into inspect_accounts() 
-#    logging.warning('%s', prop_msg)
+# Define the Host time in UTC, kernel clock sync status and the time daemon's source, stratum and offset
+def time():
+    try:
+        clock = adjtimex()
+    except (OSError, AttributeError, TypeError) as err:
+        if OPTIONS.hwclock:
+            return hwclock_time()
+        raise CollectorError("Error reading the kernel clock with adjtimex(): {err}".format(err=err))
+    time = Record("time", [
+        ("Time_UTC", datetime.utcfromtimestamp(clock.time_sec).strftime("%Y-%m-%d %H:%M:%S")),
+        ("Time_Zone", datetime.now().astimezone().tzname()),
+        ("Clock_Synchronized", "yes" if clock.synchronized else "no"),
+        ("Clock_Offset_us", round(clock.offset_us)),
+        ("Clock_Max_Error_us", clock.maxerror_us),
+        ("Clock_Est_Error_us", clock.esterror_us)])
+    source = time_source()
+    if source is None:
+        time.add("Time_Daemon", "none")
+    else:
+        time.fields.extend([("Time_Daemon", source.daemon), ("Time_Source", source.source), ("Stratum", source.stratum),
+                            ("Source_Offset_ms", round(source.offset_ms, 3)), ("Leap_Status", source.leap)])
+    return time
 
 
-# Define the main
-def main():
+# Network interface from /sys/class/net with every address the kernel holds for it
+Interface = namedtuple("Interface", ["name", "index", "mac", "type", "operstate", "mtu", "addresses"])
+# Interface address; scope is the kernel address scope (0 global, 253 link, 254 host)
+Address = namedtuple("Address", ["family", "address", "prefixlen", "broadcast", "scope"])
+
+# RTNETLINK constants from linux/rtnetlink.h and linux/if_addr.h
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_BROADCAST = 4
+RTATTR_HEADER = struct.Struct("=HH")
+ARPHRD_ETHER = 1
+# /proc/net/if_inet6 scope flags translated to the RTNETLINK address scopes (host, link, site)
+IF_INET6_SCOPES = {0x10: 254, 0x20: 253, 0x40: 200}
+SYSFS_NET = '/sys/class/net'
+
+# The interface snapshot is built once per run and shared by every interface collector
+_interface_snapshot = None
+_interface_snapshot_lock = threading.Lock()
+
+
+# Read one attribute file of a /sys/class/net interface
+def sysfs_net(name, attribute):
+    try:
+        with open(os.path.join(SYSFS_NET, name, attribute), encoding="utf-8") as file:
+            return file.read().strip()
+    except OSError:
+        return ""
+
+
+# Dump every interface address with RTM_GETADDR, returning {ifindex: [Address, ...]}
+def rtnetlink_addresses():
+    addresses = {}
+# struct ifaddrmsg with AF_UNSPEC asks for IPv4 and IPv6 at once
+    request = struct.pack("=BBBBI", socket.AF_UNSPEC, 0, 0, 0, 0)
+    for msg in netlink_dump(NETLINK_ROUTE, RTM_GETADDR, request):
+        family, prefixlen, flags, scope, index = struct.unpack_from("=BBBBI", msg)
+        attrs = {}
+        offset = 8
+        while offset + RTATTR_HEADER.size <= len(msg):
+            length, attr = RTATTR_HEADER.unpack_from(msg, offset)
+            if length < RTATTR_HEADER.size:
+                break
+            attrs[attr] = msg[offset + RTATTR_HEADER.size:offset + length]
+            offset += (length + 3) & ~3
+# For IPv4 IFA_LOCAL is the local address and IFA_ADDRESS the peer on point-to-point links
+        address = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+        if address is None or family not in (socket.AF_INET, socket.AF_INET6):
+            continue
+        broadcast = attrs.get(IFA_BROADCAST)
+        addresses.setdefault(index, []).append(Address(
+            family, socket.inet_ntop(family, address), prefixlen,
+            socket.inet_ntop(family, broadcast) if broadcast else "", scope))
+    return addresses
+
+
+# Fallback when netlink is unavailable: IPv6 from /proc/net/if_inet6 and IPv4 from a single 'ip -o -4 addr' call
+def proc_addresses(indexes):
+    addresses = {}
     try:
-        logs()
-        os.remove('/etc/temp.txt')
-    except:
-        sys.stderr.write("Issues running the hostinfo.py logging script, need to investigate why")
-        class SyslogFormatter(logging.Formatter):
-            def format(self, record):
-                result = super().format(record)
-                return "ufeff" + result
-        handler = logging.handlers.SysLogHandler('/dev/log')
-        formatter = SyslogFormatter(logging.BASIC_FORMAT)
-        handler.setFormatter(formatter)
-        isrhostlog = logging.getLogger()
-        isrhostlog.setLevel(os.environ.get("LOGLEVEL", "WARNING"))
-        isrhostlog.addHandler(handler)
-        logging.warning("At least one log message failed on %s while running the hostinfo.py logging script", hostname())
+        with open("/proc/net/if_inet6", encoding="ascii") as file:
+            for line in file:
+                hexaddr, index, prefixlen, scope = line.split()[:4]
+                address = socket.inet_ntop(socket.AF_INET6, bytes.fromhex(hexaddr))
+                addresses.setdefault(int(index, 16), []).append(
+                    Address(socket.AF_INET6, address, int(prefixlen, 16), "", IF_INET6_SCOPES.get(int(scope, 16) & 0xf0, 0)))
+    except OSError:
+        pass
+    for line in run_command(["ip", "-o", "-4", "addr"]).stdout.splitlines():
+        fields = line.split()
+        if len(fields) < 4 or fields[1] not in indexes:
+            continue
+        address, prefixlen = fields[3].split("/") if "/" in fields[3] else (fields[3], "32")
+        broadcast = fields[fields.index("brd") + 1] if "brd" in fields else ""
+        scope = {"host": 254, "link": 253}.get(fields[fields.index("scope") + 1], 0) if "scope" in fields else 0
+        addresses.setdefault(indexes[fields[1]], []).append(
+            Address(socket.AF_INET, address, int(prefixlen), broadcast, scope))
+    return addresses
+
+
+# Build the interface snapshot: names, MAC, type, state and MTU from /sys/class/net plus one address dump
+def interface_snapshot():
+    global _interface_snapshot
+    with _interface_snapshot_lock:
+        if _interface_snapshot is not None:
+            return _interface_snapshot
+        try:
+            names = os.listdir(SYSFS_NET)
+        except OSError:
+            names = []
+        indexes = {}
+        for name in names:
+            index = sysfs_net(name, "ifindex")
+            if index.isdigit():
+                indexes[name] = int(index)
+        try:
+            addresses = rtnetlink_addresses()
+        except OSError:
+            addresses = proc_addresses(indexes)
+        snapshot = []
+        for name, index in sorted(indexes.items(), key=lambda item: item[1]):
+            mtu = sysfs_net(name, "mtu")
+            arptype = sysfs_net(name, "type")
+            snapshot.append(Interface(name, index, sysfs_net(name, "address"),
+                                      int(arptype) if arptype.isdigit() else 0, sysfs_net(name, "operstate"),
+                                      int(mtu) if mtu.isdigit() else 0, addresses.get(index, [])))
+        _interface_snapshot = snapshot
+        return snapshot
+
+
+# Define the Host's network interfaces
+def interfaces():
+    interfaces = [interface.name for interface in interface_snapshot()]
+    return interfaces
+
+
+# Define the Host's primary IP address (the first global address, IPv4 preferred, like 'hostname --all-ip-addresses')
+def ipaddrpri():
+    candidates = [address for interface in interface_snapshot() for address in interface.addresses if address.scope == 0]
+    candidates.sort(key=lambda address: address.family != socket.AF_INET)
+    ipaddrpri = candidates[0].address if candidates else ''
+    return ipaddrpri
+
+
+# Dotted netmask for an IPv4 prefix length
+def netmask(prefixlen):
+    return socket.inet_ntop(socket.AF_INET, struct.pack("!I", (0xffffffff << (32 - prefixlen)) & 0xffffffff))
+
+
+# Define the Host's full interface information, one entry per address: '<interface> inet|inet6|ether <address> ...'
+def ifaddrall():
+    ifaddrall = []
+    for interface in interface_snapshot():
+        for address in interface.addresses:
+            if address.family == socket.AF_INET:
+                entry = "{i.name} inet {a.address} netmask {mask}".format(i=interface, a=address, mask=netmask(address.prefixlen))
+                if address.broadcast:
+                    entry += " broadcast {a.broadcast}".format(a=address)
+            else:
+                entry = "{i.name} inet6 {a.address}/{a.prefixlen}".format(i=interface, a=address)
+            ifaddrall.append(entry)
+        if interface.mac and interface.mac != "00:00:00:00:00:00":
+            ifaddrall.append("{i.name} ether {i.mac}".format(i=interface))
+    return ifaddrall
+
+
+# Define the Host's mac addresses
+def macaddr():
+    macaddr = [interface.mac for interface in interface_snapshot()
+               if interface.type == ARPHRD_ETHER and interface.mac and interface.mac != "00:00:00:00:00:00"]
+    return macaddr
+
+
+# Hardware fields in the order hwinfo() reports them:
+# (output key, /sys/class/dmi/id attribute, dmidecode section, dmidecode field)
+HW_FIELDS = [
+    ("Vendor", "bios_vendor", "BIOS Information", "Vendor"),
+    ("ReleaseDate", "bios_date", "BIOS Information", "Release Date"),
+    ("BIOSRevision", "bios_release", "BIOS Information", "BIOS Revision"),
+    ("FirmwareRevision", "ec_firmware_release", "BIOS Information", "Firmware Revision"),
+    ("Manufacturer", "sys_vendor", "System Information", "Manufacturer"),
+    ("ProductName", "product_name", "System Information", "Product Name"),
+    ("Version", "product_version", "System Information", "Version"),
+    ("SerialNumber", "product_serial", "System Information", "Serial Number"),
+    ("UUID", "product_uuid", "System Information", "UUID"),
+    ("AssetTag", "chassis_asset_tag", "Chassis Information", "Asset Tag"),
+]
+SYSFS_DMI = '/sys/class/dmi/id'
+DMIDUMP = '/etc/dmidump'
+HW_WORTHLESS = ("", "Not Specified")
+
+
+# Read the hardware fields the kernel exports in /sys/class/dmi/id, no subprocess or raw SMBIOS access needed.
+# Returns the fields and the set of keys that could not be read (not exported by this kernel, or only to root)
+def sysfs_hwinfo():
+    hwinfo = {}
+    unread = set()
+    for key, attribute, section, field in HW_FIELDS:
+        try:
+            with open(os.path.join(SYSFS_DMI, attribute), encoding="utf-8", errors="replace") as file:
+                value = file.read().strip()
+        except OSError:
+            unread.add(key)
+            continue
+        if value not in HW_WORTHLESS:
+            hwinfo[key] = value
+    return hwinfo, unread
+
+
+# Parse dmidecode output (or a dump of it) in one pass, keeping the first value of each wanted field per section
+def parse_dmidecode(text):
+    wanted = {}
+    for key, attribute, section, field in HW_FIELDS:
+        wanted.setdefault(section, {})[field] = key
+    hwinfo = {}
+    fields = {}
+    for line in text.splitlines():
+        if not line.startswith("\t"):
+            fields = wanted.get(line.strip(), {})
+            continue
+        field, sep, value = line.strip().partition(": ")
+        key = fields.get(field)
+        if key and key not in hwinfo and value.strip() not in HW_WORTHLESS:
+            hwinfo[key] = value.strip()
+    return hwinfo
+
+
+# Some organizations dump dmidecode data into /etc/dmidump on a regular basis; the parsed result is cached
+# on the dump's mtime and size so it is only re-parsed when the dump changes
+def dmidump_hwinfo(path=DMIDUMP):
+    path = root_path(path)
+    stat = os.stat(path)
+    key = [stat.st_mtime_ns, stat.st_size]
+    cached = read_cache("dmidump") if cache_enabled() else None
+    if cached and cached.get("key") == key:
+        return cached["hwinfo"]
+    with open(path, encoding="utf-8", errors="replace") as file:
+        hwinfo = parse_dmidecode(file.read())
+    if cache_enabled():
+        write_cache("dmidump", {"key": key, "hwinfo": hwinfo})
+    return hwinfo
+
+
+# Define the Serial Number, Asset Tag (if tagged), Manufacturer, Make/Model and BIOS information
+# from /sys/class/dmi/id, then /etc/dmidump, then a single dmidecode call (only /etc/dmidump for a system under ROOT,
+# the others describe the scanning host). Each source only fills in the fields the previous ones could not read, so a
+# field sysfs does not export (or only to root, like the serial number) still comes from the dump or dmidecode, while
+# a field the firmware leaves empty does not cost a dmidecode call on every run
+def hwinfo():
+    if ROOT != '/':
+        try:
+            hwinfo = dmidump_hwinfo()
+        except OSError:
+            raise CollectorError("'/etc/dmidump' does not exist under {root}".format(root=ROOT))
+        return Record("hwinfo", [(key, hwinfo[key]) for key, attribute, section, field in HW_FIELDS if key in hwinfo])
+    hwinfo, unread = sysfs_hwinfo()
+    if unread:
+        try:
+            dump = dmidump_hwinfo()
+        except OSError:
+            pass
+        else:
+            hwinfo.update((key, dump[key]) for key in unread if key in dump)
+            unread.difference_update(dump)
+    if unread:
+        hwinfo_cmd = run_command(["dmidecode", "--type", "0,1,3"])
+        if hwinfo_cmd.returncode == 0:
+            dump = parse_dmidecode(hwinfo_cmd.stdout)
+            hwinfo.update((key, dump[key]) for key in unread if key in dump)
+        elif not hwinfo:
+            raise CollectorError("'/sys/class/dmi/id' and '/etc/dmidump' do not exist on {hostname} and error with the 'dmidecode --type 0,1,3' command".format(hostname=hostname()))
+    return Record("hwinfo", [(key, hwinfo[key]) for key, attribute, section, field in HW_FIELDS if key in hwinfo])
+
+
+# Socket as reported by the kernel, with the process that owns it (pid 0 and process '-' when unknown)
+Socket = namedtuple("Socket", ["proto", "state", "local", "lport", "remote", "rport", "uid", "inode", "pid", "process"])
+
+# Kernel TCP states (include/net/tcp_states.h), an unconnected UDP socket sits in TCP_CLOSE
+TCP_STATES = {1: "ESTABLISHED", 2: "SYN_SENT", 3: "SYN_RECV", 4: "FIN_WAIT1", 5: "FIN_WAIT2", 6: "TIME_WAIT",
+              7: "CLOSE", 8: "CLOSE_WAIT", 9: "LAST_ACK", 10: "LISTEN", 11: "CLOSING"}
+TCP_ESTABLISHED = 1
+TCP_CLOSE = 7
+TCP_LISTEN = 10
+
+# Netlink constants from linux/netlink.h, linux/sock_diag.h and linux/inet_diag.h
+NETLINK_ROUTE = 0
+NETLINK_SOCK_DIAG = 4
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+SOCK_DIAG_BY_FAMILY = 20
+NLMSG_HEADER = struct.Struct("=IHHII")
+
+
+# Send one netlink dump request and yield the payload of every reply message until the kernel says it is done
+def netlink_dump(protocol, msg_type, payload):
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, protocol)
+    try:
+        sock.bind((0, 0))
+        sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), msg_type, NLM_F_REQUEST | NLM_F_DUMP, 1, 0) + payload)
+        while True:
+            data = sock.recv(65536)
+            offset = 0
+            while offset + NLMSG_HEADER.size <= len(data):
+                length, reply_type = NLMSG_HEADER.unpack_from(data, offset)[:2]
+                if reply_type == NLMSG_DONE:
+                    return
+                if reply_type == NLMSG_ERROR:
+                    error = -struct.unpack_from("=i", data, offset + NLMSG_HEADER.size)[0]
+                    raise OSError(error, os.strerror(error))
+                yield data[offset + NLMSG_HEADER.size:offset + length]
+                offset += (length + 3) & ~3
+    finally:
+        sock.close()
+
+
+# Decode an address as printed in /proc/net/{tcp,udp}{,6}: the hex digits are the in-memory 32-bit words
+def proc_net_address(hexaddr):
+    if len(hexaddr) == 8:
+        return socket.inet_ntop(socket.AF_INET, struct.pack("<I", int(hexaddr, 16)))
+    packed = b"".join(struct.pack("<I", int(hexaddr[i:i + 8], 16)) for i in range(0, 32, 8))
+    return socket.inet_ntop(socket.AF_INET6, packed)
+
+
+# Keep listening (TCP LISTEN, unconnected UDP) and established sockets; other states are transient
+def wanted_state(state, listen_only):
+    if state in (TCP_LISTEN, TCP_CLOSE):
+        return True
+    return state == TCP_ESTABLISHED and not listen_only
+
+
+# Read /proc/net/{tcp,tcp6,udp,udp6}, yielding (proto, state, local, lport, remote, rport, uid, inode)
+def proc_net_sockets(listen_only=False):
+    for proto in ("tcp", "tcp6", "udp", "udp6"):
+        try:
+            with open("/proc/net/" + proto, encoding="ascii") as file:
+                next(file, None)
+                for line in file:
+                    fields = line.split()
+                    state = int(fields[3], 16)
+                    if proto.startswith("tcp") and state == TCP_CLOSE:
+                        continue
+                    if not wanted_state(state, listen_only):
+                        continue
+                    local, lport = fields[1].split(":")
+                    remote, rport = fields[2].split(":")
+                    yield (proto, state, proc_net_address(local), int(lport, 16), proc_net_address(remote),
+                           int(rport, 16), int(fields[7]), int(fields[9]))
+        except OSError:
+            continue
+
+
+# Ask the kernel for the same sockets through NETLINK_SOCK_DIAG, which skips the text formatting of /proc/net
+def sock_diag_sockets(listen_only=False):
+    tcp_states = 1 << TCP_LISTEN if listen_only else (1 << TCP_LISTEN) | (1 << TCP_ESTABLISHED)
+    udp_states = 1 << TCP_CLOSE if listen_only else (1 << TCP_CLOSE) | (1 << TCP_ESTABLISHED)
+    for proto, ipproto, states in (("tcp", socket.IPPROTO_TCP, tcp_states), ("udp", socket.IPPROTO_UDP, udp_states)):
+        for family, suffix in ((socket.AF_INET, ""), (socket.AF_INET6, "6")):
+# struct inet_diag_req_v2 followed by an all-zero struct inet_diag_sockid
+            request = struct.pack("=BBBxI", family, ipproto, 0, states) + bytes(48)
+            for msg in netlink_dump(NETLINK_SOCK_DIAG, SOCK_DIAG_BY_FAMILY, request):
+                state = msg[1]
+                lport, rport = struct.unpack_from("!HH", msg, 4)
+                uid, inode = struct.unpack_from("=II", msg, 64)
+                addrlen = 4 if family == socket.AF_INET else 16
+                local = socket.inet_ntop(family, msg[8:8 + addrlen])
+                remote = socket.inet_ntop(family, msg[24:24 + addrlen])
+                yield (proto + suffix, state, local, lport, remote, rport, uid, inode)
+
+
+# Map socket inodes to the owning pid with a single pass over /proc/*/fd, stopping once every wanted inode is found
+def socket_owners(inodes):
+    owners = {}
+    wanted = set(inodes)
+    try:
+        pids = [entry.name for entry in os.scandir("/proc") if entry.name.isdigit()]
+    except OSError:
+        return owners
+    for pid in pids:
+        if not wanted:
+            break
+        fd_dir = "/proc/" + pid + "/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                target = os.readlink(fd_dir + "/" + fd)
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                inode = int(target[8:-1])
+                if inode in wanted:
+                    owners[inode] = int(pid)
+                    wanted.discard(inode)
+    return owners
+
+
+# Name of a running process, from /proc/<pid>/comm
+def process_name(pid):
+    try:
+        with open("/proc/{pid}/comm".format(pid=pid), encoding="utf-8", errors="replace") as file:
+            return file.read().strip()
+    except OSError:
+        return "-"
+
+
+# Define the listening and established sockets on the host with their owning process, netlink first, /proc/net otherwise.
+# The sockets are listed twice: once for their inodes, to find the owners in a single pass over /proc/*/fd, then again
+# to yield them, so they are never all held
+def sockets(listen_only=False):
+    listing = sock_diag_sockets
+    try:
+        inodes = set(entry[7] for entry in listing(listen_only) if entry[7])
+    except OSError:
+        listing = proc_net_sockets
+        inodes = set(entry[7] for entry in listing(listen_only) if entry[7])
+    owners = socket_owners(inodes)
+    del inodes
+    names = {}
+    for proto, state, local, lport, remote, rport, uid, inode in listing(listen_only):
+        pid = owners.get(inode, 0)
+        if pid and pid not in names:
+            names[pid] = process_name(pid)
+        if proto.startswith("udp"):
+            state = "UNCONN" if state == TCP_CLOSE else TCP_STATES[state]
+        else:
+            state = TCP_STATES.get(state, str(state))
+        yield Socket(proto, state, local, lport, remote, rport, uid, inode, pid, names.get(pid, "-"))
+
+
+# Format an address and port the way netstat does, with brackets around IPv6 addresses
+def endpoint(address, port):
+    if ":" in address:
+        address = "[" + address + "]"
+    return "{address}:{port}".format(address=address, port=port if port else "*")
+
+
+# Define the current open ports on the host
+def netstat():
+    try:
+        for s in sockets(OPTIONS.listen_only):
+            yield "{s.proto} {local} {remote} {s.state} {owner}".format(
+                s=s, local=endpoint(s.local, s.lport), remote=endpoint(s.remote, s.rport),
+                owner="{0}/{1}".format(s.pid, s.process) if s.pid else "-")
+    except OSError as err:
+        raise CollectorError("Error reading sockets from netlink and /proc/net: {err}".format(err=err))
+
+
+# Files are hashed HASH_BLOCK bytes at a time on a pool of threads, hashlib releases the GIL while it hashes a large
+# buffer. Processes and SUID files are hashed and reported HASH_BATCH at a time
+HASH_WORKERS = 4
+HASH_BLOCK = 1 << 20
+HASH_BATCH = 256
+
+
+# The items of an iterable in lists of at most size items
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# SHA-256 of a file as a hex string
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb", buffering=0) as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# SHA-256 of files kept between runs and keyed on (dev, inode) with the size, mtime and ctime the hash was taken at:
+# writing, replacing or chmod-ing a file changes its ctime, so a file whose key is unchanged is not read again.
+# The CPU time of the hashing threads is added to the metrics of the collector that created the cache
+class HashCache(object):
+    def __init__(self, name):
+        self.name = name
+        self.metrics = getattr(_current, "metrics", None)
+        self.enabled = cache_enabled()
+        self.files = (read_cache(name) or {}) if self.enabled else {}
+        self.seen = set()
+        self.changed = False
+        self.pool = None
+
+    # Hash of every (path, stat) by "dev:inode", hashing only the files missing from the cache; a file that cannot
+    # be read gets an empty hash and is not cached
+    def hashes(self, files):
+        hashes = {}
+        missing = {}
+        for path, stat in files:
+            key = "{0}:{1}".format(stat.st_dev, stat.st_ino)
+            value = [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns]
+            self.seen.add(key)
+            cached = self.files.get(key)
+            if cached and cached[:3] == value:
+                hashes[key] = cached[3]
+            elif key not in missing:
+                missing[key] = (path, value)
+        if missing:
+            if self.pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.pool = ThreadPoolExecutor(HASH_WORKERS)
+
+            def digest(path):
+                cpu = thread_time()
+                try:
+                    return sha256_file(path), thread_time() - cpu
+                except (OSError, ValueError):
+                    return "", thread_time() - cpu
+
+            for (key, (path, value)), (sha256, cpu) in zip(missing.items(), self.pool.map(digest, [path for path, value in missing.values()])):
+                if self.metrics is not None:
+                    self.metrics.cpu += cpu
+                hashes[key] = sha256
+                if sha256:
+                    self.files[key] = value + [sha256]
+                    self.changed = True
+        return hashes
+
+    # Stop the hashing threads and write the cache, without the files that were not seen
+    def save(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if not self.enabled:
+            return
+        for key in list(self.files):
+            if key not in self.seen:
+                del self.files[key]
+                self.changed = True
+        if self.changed:
+            write_cache(self.name, self.files)
+
+
+# Command lines are cut to this many characters
+CMDLINE_MAX = 512
+
+
+# Define the running processes with the SHA-256 of the executable they run: "pid=... uid=... exe=... sha256=...
+# cmdline=...", in /proc order, HASH_BATCH processes at a time. The executable is hashed through /proc/<pid>/exe, so a
+# binary deleted or replaced since the process started (exe ends in ' (deleted)') is still the one hashed; kernel
+# threads have no executable and are left out
+def processes():
+    cache = HashCache("process_hashes")
+    for batch in batches(running_processes(), HASH_BATCH):
+        hashes = cache.hashes([("/proc/{0}/exe".format(pid), stat) for pid, uid, path, stat in batch])
+        for pid, uid, path, stat in batch:
+            try:
+                with open("/proc/{pid}/cmdline".format(pid=pid), "rb") as file:
+                    cmdline = file.read().replace(b"\0", b" ").strip().decode("utf-8", "replace")[:CMDLINE_MAX]
+            except OSError:
+                cmdline = ""
+            yield "pid={0} uid={1} exe={2} sha256={3} cmdline={4}".format(
+                pid, uid, path, hashes["{0}:{1}".format(stat.st_dev, stat.st_ino)], cmdline)
+    cache.save()
+
+
+# (pid, uid, executable, stat of the executable) of every process that runs one
+def running_processes():
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        exe = os.path.join(entry.path, "exe")
+        try:
+            yield int(entry.name), entry.stat().st_uid, os.readlink(exe), os.stat(exe)
+        except OSError:
+            continue
+
+
+MOUNTINFO = '/proc/self/mountinfo'
+# Filesystems never walked for SUID/SGID files: network filesystems (slow, and inventoried on their server), FUSE
+# mounts (mostly remote: sshfs, s3fs, gvfs) and kernel pseudo filesystems
+SKIP_FILESYSTEMS = frozenset(("nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs",
+                              "lustre", "gpfs", "davfs", "fuse", "proc", "sysfs", "devtmpfs", "devpts", "cgroup",
+                              "cgroup2", "securityfs", "debugfs", "tracefs", "pstore", "bpf", "configfs", "fusectl",
+                              "mqueue", "hugetlbfs", "autofs", "binfmt_misc", "selinuxfs", "efivarfs", "rpc_pipefs",
+                              "nsfs"))
+# Octal escapes of the mount point field of mountinfo (space, tab, newline, backslash)
+MOUNTINFO_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+# Mount points of the filesystems in SKIP_FILESYSTEMS, from /proc/self/mountinfo
+# ("id parent major:minor root mountpoint options [optional fields] - fstype source superoptions")
+def skipped_mounts():
+    skipped = set()
+    try:
+        with open(MOUNTINFO, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                fields = line.split()
+                if "-" not in fields or len(fields) < 5:
+                    continue
+                fstype = fields[fields.index("-") + 1]
+                if fstype in SKIP_FILESYSTEMS or fstype.startswith("fuse."):
+                    skipped.add(MOUNTINFO_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), fields[4]))
+    except OSError:
+        pass
+    return skipped
+
+
+# (path, stat) of every SUID or SGID regular file under top, walked with os.scandir without following symlinks
+# and without entering the skipped mount points
+def setuid_walk(top, skipped):
+    directories = [top]
+    while directories:
+        try:
+            entries = os.scandir(directories.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.path not in skipped:
+                            directories.append(entry.path)
+                        continue
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                if stat.st_mode & (S_ISUID | S_ISGID):
+                    yield entry.path, stat
+
+
+# Define the SUID and SGID files on the local filesystems (of the system under ROOT with --root) with their mode,
+# owner and SHA-256: "path mode=4755 uid=0 gid=0 sha256=...", in the order the walk finds them, HASH_BATCH at a time
+def setuid_files():
+    top = root_path("/")
+    prefix = len(top.rstrip("/"))
+    cache = HashCache("setuid_hashes")
+    for batch in batches(setuid_walk(top, skipped_mounts()), HASH_BATCH):
+        hashes = cache.hashes(batch)
+        for path, stat in batch:
+            yield "{0} mode={1:o} uid={2} gid={3} sha256={4}".format(
+                path[prefix:], S_IMODE(stat.st_mode), stat.st_uid, stat.st_gid, hashes["{0}:{1}".format(stat.st_dev, stat.st_ino)])
+    cache.save()
+
+
+# Define the current status of SELinux (enabled / disabled / permissive /enforcing), one field per 'sestatus' line
+# keyed on its label without spaces (SELinuxstatus, Currentmode, Loadedpolicyname, ...)
+def sestatus():
+    sestatus_cmd = run_command(["sestatus"])
+    if sestatus_cmd.returncode != 0:
+        raise CollectorError("Error with 'sestatus' command")
+    sestatus = Record("sestatus")
+    for line in sestatus_cmd.stdout.splitlines():
+        label, sep, value = line.partition(":")
+        if sep:
+            sestatus.add(label.replace(" ", ""), value.strip())
+    return sestatus
+
+
+# One /etc/passwd entry; __slots__ keeps the per-account cost small on hosts with hundreds of thousands of entries
+class Account(object):
+    __slots__ = ("name", "password", "uid", "gid", "gecos", "home", "shell")
+
+    def __init__(self, name, password, uid, gid, gecos, home, shell):
+        self.name = name
+        self.password = password
+        self.uid = uid
+        self.gid = gid
+        self.gecos = gecos
+        self.home = home
+        self.shell = shell
+
+    def line(self):
+        return ":".join((self.name, self.password, self.uid, self.gid, self.gecos, self.home, self.shell))
+
+
+PASSWD = '/etc/passwd'
+# Accounts that exist on every host and are reported with the service accounts
+SYSTEM_ACCOUNTS = ("root", "sync", "shutdown", "halt")
+
+
+# Stream a passwd file as Accounts, skipping comments, blank and NIS compat lines
+def parse_passwd(file):
+    for line in file:
+        fields = line.rstrip("\n").split(":")
+        if len(fields) != 7 or not fields[0] or fields[0][0] in "#+-":
+            continue
+        yield Account(*fields)
+
+
+# Accounts with a login shell, other than the system accounts every host has; the others (no login shell, or a system
+# account) are the service accounts
+def login_account(account):
+    return "nologin" not in account.shell and account.name not in SYSTEM_ACCOUNTS
+
+
+# Account sections served by one pass over passwd: whether each takes the login or the service accounts, and its item
+ACCOUNT_SECTIONS = {
+    "user_accounts": (True, Account.line),
+    "service_accounts": (False, Account.line),
+    "monikers": (True, lambda account: account.name),
+}
+
+# The first account collector of a run reads passwd for every account section of the run, the others find their
+# section here: its list, SENT when it was streamed to the run's outlet, or the error that stopped the pass
+_account_sections = {}
+_account_sections_lock = threading.Lock()
+
+
+# Result of the account collector name, from the shared pass over passwd
+def account_section(name, path=PASSWD):
+    path = root_path(path)
+    with _account_sections_lock:
+        if path not in _account_sections:
+            outlet = getattr(_current, "outlet", None)
+            wanted = [section for section in ACCOUNT_SECTIONS if section in (getattr(_current, "names", None) or ACCOUNT_SECTIONS)]
+            if outlet is None:
+                sinks = dict((section, []) for section in wanted)
+                adds = [(ACCOUNT_SECTIONS[section], sinks[section].append) for section in wanted]
+            else:
+                sinks = dict((section, outlet.section(SECTION_BUILDERS[section](iter(())))) for section in wanted)
+                adds = [(ACCOUNT_SECTIONS[section], sinks[section].add) for section in wanted]
+            try:
+                with open(path, 'r', encoding="utf-8", errors="replace") as file:
+                    for account in parse_passwd(file):
+                        login = login_account(account)
+                        for (logins, item), add in adds:
+                            if login == logins:
+                                add(item(account))
+                if outlet is not None:
+                    for section in wanted:
+                        sinks[section].close()
+                        sinks[section] = SENT
+            except Exception as err:
+                sinks = dict((section, err) for section in wanted)
+            _account_sections[path] = sinks
+        section = _account_sections[path].get(name)
+    if isinstance(section, Exception):
+        raise section
+    return section
+
+
+# Define all user accounts on the host
+def user_accounts():
+    return account_section("user_accounts")
+
+
+# Define all user monikers for accounts on the host
+def monikers():
+    return account_section("monikers")
+
+
+# Enterprise account list exported as XML, the first of these that exists is used (these filepaths must match your
+# organizational environment); every <username> element holds one organizational account name
+ENTERPRISE_USERS = ('/usr/local/share/fakepath.xml', '/etc/sysconfig/fakepath.xml')
+ENTERPRISE_USERNAME_TAG = 'username'
+
+
+# Stream the enterprise XML into a set of usernames: each top-level record is cleared once it has been read,
+# so memory stays flat however large the export is. lxml is used when installed (without entity expansion),
+# the standard library parser otherwise
+def parse_enterprise_users(path):
+    etree = optional_import("lxml.etree")
+    if etree is not None:
+        events = etree.iterparse(path, events=("start", "end"), resolve_entities=False, no_network=True)
+    else:
+        import xml.etree.ElementTree as etree
+        events = etree.iterparse(path, events=("start", "end"))
+    names = set()
+    root = None
+    depth = 0
+    for event, element in events:
+        if event == "start":
+            if root is None:
+                root = element
+            depth += 1
+            continue
+        depth -= 1
+        if element.tag == ENTERPRISE_USERNAME_TAG and element.text and element.text.strip():
+            names.add(element.text.strip())
+        if depth == 1:
+            root.clear()
+    return names
+
+
+# The username set of an enterprise XML, kept in the cache as one newline-joined string keyed on the XML's path,
+# mtime and size, so the export is only parsed again when it changes
+def enterprise_usernames(path):
+    stat = os.stat(path)
+    key = [path, stat.st_mtime_ns, stat.st_size]
+    cached = read_cache("enterprise_users") if cache_enabled() else None
+    if cached and cached.get("key") == key:
+        return set(cached["names"].split("\n")) if cached["names"] else set()
+    names = parse_enterprise_users(path)
+    if cache_enabled():
+        write_cache("enterprise_users", {"key": key, "names": "\n".join(sorted(names))})
+    return names
+
+
+# Define all non-enterprise accounts: the login accounts missing from the enterprise account list, in passwd order
+# (note: requires the enterprise account list to be in xml in a directory available to the local host). It waits for
+# the enterprise export, so it streams passwd on its own instead of sharing the pass of the other account collectors
+def inspect_accounts():
+    paths = [root_path(path) for path in ENTERPRISE_USERS if os.path.isfile(root_path(path))]
+    if not paths:
+        return Record("inspect_accounts", [("Local_accountsORl33t_hackerz?", login_names()), ("Note", "Confirm that {hostname}=NON-ORGANIZATIONAL_host: error finding the fakepath.xml prevents parsing non-org-users".format(hostname=hostname()))])
+    org_users = enterprise_usernames(paths[0])
+    non_org_users = (name for name in login_names() if name not in org_users)
+# The note depends on whether there is any non-organizational account at all, so the first one is looked for up front
+    first = next(non_org_users, None)
+    if first is None:
+        return Record("inspect_accounts", [("Local_accountsORl33t_hackerz?", []), ("Note", "{hostname}'s /etc/passwd entries match the organizational listing".format(hostname=hostname()))])
+    return Record("inspect_accounts", [("Local_accountsORl33t_hackerz?", itertools.chain([first], non_org_users))])
+
+
+# Names of the login accounts of a passwd file, in passwd order
+def login_names(path=PASSWD):
+    with open(root_path(path), 'r', encoding="utf-8", errors="replace") as file:
+        for account in parse_passwd(file):
+            if login_account(account):
+                yield account.name
+
+
+# Define all service accounts on the host
+def service_accounts():
+    return account_section("service_accounts")
+
+
+SUDOERS = '/etc/sudoers'
+# sudo gives up on include chains deeper than this
+SUDOERS_MAX_DEPTH = 128
+# Lines that only set options, not privileges
+SUDOERS_DEFAULTS = re.compile(r"^Defaults\b|^DEFAULT\b")
+SUDOERS_INCLUDE = re.compile(r"^[#@](include|includedir)\s+(.+)$")
+# A '#' starts a comment unless it is followed by digits (a numeric user or group ID)
+SUDOERS_COMMENT = re.compile(r"(^|\s)#(?!\d).*$")
+
+
+# Parse one sudoers file into entries in file order: ("rule", text) for every privilege or alias line
+# (continuation lines joined, whitespace collapsed) and ("include", path) / ("includedir", path) for directives
+def parse_sudoers(file):
+    pending = ""
+    for line in file:
+        line = pending + line.rstrip("\n")
+        pending = ""
+        if line.endswith("\\"):
+            pending = line[:-1] + " "
+            continue
+        line = line.strip()
+        include = SUDOERS_INCLUDE.match(line)
+        if include:
+            yield include.group(1), include.group(2).strip().strip('"')
+            continue
+        line = SUDOERS_COMMENT.sub("", line).strip()
+        if not line or SUDOERS_DEFAULTS.match(line):
+            continue
+        yield "rule", " ".join(line.split())
+
+
+# Entries of a sudoers file read as they are wanted, the file is closed once they have run out
+def read_sudoers(file):
+    with file:
+        yield from parse_sudoers(file)
+
+
+# Parsed sudoers files kept between runs and keyed on (inode, mtime, size), so only changed files are re-parsed.
+# A disabled cache streams every file instead: the file is opened here (an unreadable one raises OSError at once) and
+# its entries are parsed as they are wanted
+class SudoersCache(object):
+    def __init__(self, enabled=True):
+        self.enabled = enabled and cache_enabled()
+        self.files = (read_cache("sudoers") or {}) if self.enabled else {}
+        self.changed = False
+
+    def entries(self, path):
+        if not self.enabled:
+            return read_sudoers(open(root_path(path), 'r', encoding='utf-8', errors="replace"))
+        stat = os.stat(root_path(path))
+        key = [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+        cached = self.files.get(path)
+        if cached and cached["key"] == key:
+            return cached["entries"]
+        with open(root_path(path), 'r', encoding='utf-8', errors="replace") as file:
+            entries = list(parse_sudoers(file))
+        self.files[path] = {"key": key, "entries": entries}
+        self.changed = True
+        return entries
+
+    def save(self, seen):
+        if not self.enabled:
+            return
+        for path in list(self.files):
+            if path not in seen:
+                del self.files[path]
+                self.changed = True
+        if self.changed:
+            write_cache("sudoers", self.files)
+
+
+# Files read by an #includedir: sudo skips names ending in '~' or containing a '.' and reads the rest in sorted order
+def sudoers_includedir(path):
+    try:
+        names = sorted(os.listdir(root_path(path)))
+    except OSError:
+        return []
+    return [os.path.join(path, name) for name in names if not name.endswith("~") and "." not in name]
+
+
+# Resolve the rules of a sudoers file in the order sudo reads them, following #include and #includedir
+# (relative paths are relative to the including file, %h is the short host name). Paths are the system's own,
+# root_path() is applied when a file is read. An included file that cannot be read is skipped like sudo does, the
+# sudoers file itself raises CollectorError so that "no rules" and "could not read sudoers" are told apart
+def sudoers_rules(path, cache, seen, depth=0):
+    if path in seen or depth > SUDOERS_MAX_DEPTH:
+        return
+    seen.add(path)
+    try:
+        entries = cache.entries(path)
+    except OSError as err:
+        if depth == 0:
+            raise CollectorError("Error reading '{0}': {1}".format(path, err))
+        return
+    for kind, value in entries:
+        if kind == "rule":
+            yield value
+            continue
+        target = value.replace("%h", hostname().split(".")[0])
+        target = os.path.join(os.path.dirname(path), target)
+        targets = [target] if kind == "include" else sudoers_includedir(target)
+        for target in targets:
+            yield from sudoers_rules(target, cache, seen, depth + 1)
+
+
+# Define the sudoers privileges on the host
+# Note that some organizations may use multiple sudoers files so we need to consider more than just /etc/sudoers.
+# A run that streams its sections reads the files as it sends them, which costs what loading their cached entries
+# would, so the sudoers cache only serves the runs that hold every rule anyway (--delta, the agent)
+def sudoers():
+    cache = SudoersCache(enabled=getattr(_current, "outlet", None) is None)
+    seen = set()
+    yield from sudoers_rules(SUDOERS, cache, seen)
+    cache.save(seen)
+
+
+SHADOW = '/etc/shadow'
+# Passwords must be changed every 180 days per NIST policy, 179 days is used here to ensure we have leeway
+# to fix accounts and not violate the policy
+PASSWORD_MAX_AGE = 179
+EPOCH = datetime(1970, 1, 1).date()
+
+# Password aging fields of every /etc/shadow entry, as parallel lists (days since the epoch, -1 when unset)
+ShadowTable = namedtuple("ShadowTable", ["names", "usable", "lastchg", "maxdays", "inactive", "expire"])
+
+
+# Read /etc/shadow once into a ShadowTable; a password starting with '!' or '*' (or none at all) cannot be used to log in
+def read_shadow(path=SHADOW):
+    table = ShadowTable([], [], [], [], [], [])
+    with open(path, 'r', encoding="utf-8", errors="replace") as file:
+        for line in file:
+            fields = line.rstrip("\n").split(":")
+            if len(fields) < 8 or not fields[0] or fields[0][0] in "#+-":
+                continue
+            table.names.append(fields[0])
+            table.usable.append(bool(fields[1]) and fields[1][0] not in "!*")
+            for column, value in zip(table[2:], (fields[2], fields[4], fields[6], fields[7])):
+                column.append(int(value) if value.isdigit() else -1)
+    return table
+
+
+# The shadow table is read once per run and shared by root_change() and password_aging()
+_shadow_tables = {}
+_shadow_tables_lock = threading.Lock()
+
+
+def shadow_table(path=SHADOW):
+    path = root_path(path)
+    with _shadow_tables_lock:
+        if path not in _shadow_tables:
+            _shadow_tables[path] = read_shadow(path)
+        return _shadow_tables[path]
+
+
+# Day number (days since the epoch) as a date string
+def epoch_day(days):
+    return str(EPOCH + timedelta(days=int(days)))
+
+
+# Importing NumPy costs about 100 ms and tens of MB, it only pays off for the password aging of very large shadow files
+PASSWORD_AGING_NUMPY_MIN = 50000
+
+
+# Check the password age of every account at once: returns one violation record per usable password that is
+# older than the policy allows or was flagged to be changed at next login
+def password_aging_violations(table, today=None, max_age=PASSWORD_MAX_AGE):
+    if today is None:
+        today = (datetime.now().date() - EPOCH).days
+    np = optional_import("numpy") if len(table.names) >= PASSWORD_AGING_NUMPY_MIN else None
+    if np is None:
+        return [password_aging_record(table, i, today) for i in range(len(table.names))
+                if table.usable[i] and table.lastchg[i] >= 0 and (table.lastchg[i] == 0 or today - table.lastchg[i] >= max_age)]
+    usable = np.array(table.usable, dtype=bool)
+    lastchg = np.array(table.lastchg, dtype=np.int64)
+    age = today - lastchg
+    stale = usable & (lastchg >= 0) & ((lastchg == 0) | (age >= max_age))
+    return [password_aging_record(table, int(i), today) for i in np.flatnonzero(stale)]
+
+
+# Violation record of the account at index i of the shadow table
+def password_aging_record(table, i, today):
+    lastchg, maxdays, inactive, expire = table.lastchg[i], table.maxdays[i], table.inactive[i], table.expire[i]
+    changed = lastchg > 0
+    expired = changed and maxdays >= 0 and today > lastchg + maxdays
+    locked = expired and inactive >= 0 and today > lastchg + maxdays + inactive
+    return Record("password_aging", [
+        ("Password_Policy_Violation", table.names[i]),
+        ("Last_Changed", epoch_day(lastchg) if changed else "must_change"),
+        ("Age_Days", today - lastchg if changed else ""),
+        ("Password_Expired", "yes" if expired else "no"),
+        ("Inactive_Locked", "yes" if locked else "no"),
+        ("Account_Expires", epoch_day(expire) if expire >= 0 else "never")])
+
+
+# Define the password policy violations of every account on the host from a single read of /etc/shadow
+def password_aging():
+    try:
+        return password_aging_violations(shadow_table())
+    except OSError as err:
+        raise CollectorError("Error reading '{path}': {err}".format(path=SHADOW, err=err.strerror))
+
+
+# Define the age of the root password and compare its last-change-date to the frequency it is supposed to be changed
+# (every 180 days per NIST policy). 179 days is used here to ensure we have leeway to fix accounts and not violate the policy.
+def root_change():
+    try:
+        table = shadow_table()
+    except OSError:
+        raise CollectorError("Error reading '{path}' for the root password age".format(path=SHADOW))
+    if "root" not in table.names or table.lastchg[table.names.index("root")] < 0:
+        raise CollectorError("Error finding the root password age in '{path}'".format(path=SHADOW))
+    root_change = datetime.combine(EPOCH + timedelta(days=table.lastchg[table.names.index("root")]), datetime.min.time())
+    today = datetime.now()
+    if (root_change + timedelta(days = PASSWORD_MAX_AGE)) <= today:
+        status = "CHANGE_ROOT_PASSWORD"
+    else:
+        status = "Root_password_current"
+    return Record("root_change", [("Root_Password_Status", status), ("last_root_changed", str(root_change))])
+
+
+# Messages wait in a bounded queue for the sender thread, send() blocks while it is full
+TRANSPORT_QUEUE_SIZE = 1000
+# A failed batch is retried with exponential backoff (seconds, with jitter) before it is spooled
+TRANSPORT_RETRIES = 5
+TRANSPORT_BACKOFF = 1.0
+TRANSPORT_MAX_BACKOFF = 30.0
+TRANSPORT_CONNECT_TIMEOUT = 10.0
+# close() waits this long for the queue to drain, whatever is left is spooled
+TRANSPORT_CLOSE_TIMEOUT = 120.0
+# Messages that could not be delivered are kept here (one per line) and sent first on the next run
+SPOOL_DIR = '/var/spool/hostinfo'
+SPOOL_MAX_BYTES = 50 * 1024 * 1024
+SYSLOG_PRIORITY = syslog.LOG_AUTHPRIV | syslog.LOG_WARNING
+# Local syslog keeps the priority the logging handler always sent: it shifts the already shifted syslog.LOG_AUTHPRIV
+# once more, giving <644>, which the rsyslog rules forwarding these messages match
+LOCAL_SYSLOG_ADDRESS = '/dev/log'
+LOCAL_SYSLOG_PRIORITY = syslog.LOG_AUTHPRIV << 3 | syslog.LOG_WARNING
+SYSLOG_PORTS = {"tcp": 601, "tls": 6514}
+HEC_SOURCETYPE = 'hostinfo'
+HEC_TOKEN_ENV = 'HOSTINFO_HEC_TOKEN'
+# gzip level for HEC batches, level 9 costs several times the CPU for a few percent smaller bodies
+HEC_GZIP_LEVEL = 1
+
+# The local syslog logger of main()'s failure report is created once
+_syslog_logger = None
+_syslog_logger_lock = threading.Lock()
+
+
+# Local syslog messages start with the literal "ufeff", as they always have; Splunk searches may depend on it
+class SyslogFormatter(logging.Formatter):
+    def format(self, record):
+        result = super().format(record)
+        return "ufeff" + result
+
+
+# Logger writing to the local syslog socket (/dev/log), forwarded by rsyslog
+def syslog_logger():
+    global _syslog_logger
+    with _syslog_logger_lock:
+        if _syslog_logger is None:
+            handler = logging.handlers.SysLogHandler(LOCAL_SYSLOG_ADDRESS, facility=syslog.LOG_AUTHPRIV)
+            handler.setFormatter(SyslogFormatter(logging.BASIC_FORMAT))
+            logger = logging.getLogger("hostinfo")
+            logger.setLevel(os.environ.get("LOGLEVEL", "WARNING"))
+            logger.propagate = False
+            logger.addHandler(handler)
+            _syslog_logger = logger
+        return _syslog_logger
+
+
+# Token bucket limiting the bytes sent per second; a take larger than the bucket is let through once it is full and
+# the debt is paid off by waiting before the next one
+class TokenBucket(object):
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self.tokens = self.burst
+        self.stamp = monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, amount):
+        with self.lock:
+            stamp = monotonic()
+            self.tokens = min(self.burst, self.tokens + (stamp - self.stamp) * self.rate)
+            self.stamp = stamp
+            wait = (amount - self.tokens) / self.rate if amount > self.tokens else 0
+            self.tokens -= amount
+        if wait > 0:
+            sleep(wait)
+
+
+# Base class of the transports: send() queues a message, a sender thread delivers them in batches with retries and
+# backoff, and a batch that still fails is spooled to disk and replayed on the next run.
+# Subclasses implement deliver(batch), raising OSError when the batch was not delivered
+class Transport(object):
+    name = "transport"
+    batch_size = 100
+
+    def __init__(self, spool_dir=SPOOL_DIR, queue_size=TRANSPORT_QUEUE_SIZE, retries=TRANSPORT_RETRIES,
+                 backoff=TRANSPORT_BACKOFF, rate_limit=0):
+        self.spool_dir = spool_dir
+        self.retries = retries
+        self.backoff = backoff
+# With a rate limit a batch holds about one second of sending, so the bytes go out evenly
+        self.bucket = TokenBucket(rate_limit, max(rate_limit, MESSAGE_BUDGET)) if rate_limit else None
+        self.batch_bytes = max(rate_limit, MESSAGE_BUDGET) if rate_limit else None
+# Characters queued by send() and handled by the sender thread, each written by one thread only
+        self.queued_chars = 0
+        self.handled_chars = 0
+        self.queue = queue.Queue(queue_size)
+        self.closing = False
+        self.delivered = 0
+        self.spooled = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self.run, name="hostinfo-" + self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def send(self, message):
+        self.queued_chars += len(message)
+        self.queue.put(message)
+
+    # A rate-limited transport is also given the time its queued bytes need at the limit
+    def close(self, timeout=TRANSPORT_CLOSE_TIMEOUT):
+        if self.bucket is not None:
+            timeout += (self.queued_chars - self.handled_chars) / self.bucket.rate
+        self.queue.put(None)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            self.closing = True
+            self.thread.join(self.backoff)
+        left = []
+        while True:
+            try:
+                message = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if message is not None:
+                left.append(message)
+        self.spool(left)
+        self.disconnect()
+
+    def deliver(self, batch):
+        raise NotImplementedError
+
+    def disconnect(self):
+        pass
+
+    def run(self):
+        self.replay()
+        while True:
+            batch = [self.queue.get()]
+            size = len(batch[0] or "")
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                if self.batch_bytes is not None and size >= self.batch_bytes:
+                    break
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+                size += len(batch[-1] or "")
+            done = batch[-1] is None
+            batch = [message for message in batch if message is not None]
+            if batch:
+                self.deliver_with_retries(batch)
+                self.handled_chars += size
+            if done:
+                return
+
+    def deliver_with_retries(self, batch):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            if self.bucket is not None:
+                self.bucket.take(sum(len(message.encode("utf-8")) for message in batch))
+            try:
+                self.deliver(batch)
+                self.delivered += len(batch)
+                return True
+            except OSError as err:
+                self.last_error = err
+                self.disconnect()
+            if self.closing or attempt == self.retries:
+                break
+            sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, TRANSPORT_MAX_BACKOFF)
+        self.spool(batch)
+        return False
+
+    def spool_path(self):
+        return os.path.join(self.spool_dir, self.name + ".spool")
+
+    # Append undelivered messages to the spool, dropping them once the spool has reached SPOOL_MAX_BYTES
+    def spool(self, messages):
+        if not messages:
+            return
+        path = self.spool_path()
+        try:
+            os.makedirs(self.spool_dir, mode=0o700, exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) >= SPOOL_MAX_BYTES:
+                return
+            with open(path, "a", encoding="utf-8") as file:
+                file.writelines(message + "\n" for message in messages)
+            self.spooled += len(messages)
+        except OSError:
+            pass
+
+    # Send what earlier runs spooled; the spool is renamed first so messages that fail again are spooled afresh
+    def replay(self):
+        path = self.spool_path()
+        replay = path + ".replay"
+        try:
+            if not os.path.exists(replay):
+                os.rename(path, replay)
+            with open(replay, encoding="utf-8") as file:
+                messages = [line.rstrip("\n") for line in file if line.strip()]
+        except OSError:
+            return
+        for start in range(0, len(messages), self.batch_size):
+            self.deliver_with_retries(messages[start:start + self.batch_size])
+        try:
+            os.remove(replay)
+        except OSError:
+            pass
+
+
+# Local syslog through /dev/log, left to rsyslog to forward (the original behaviour). The messages are the ones the
+# logging handler emitted for a warning, but written to the socket here: the handler reports a failed send to
+# handleError() and drops the message, so a stopped rsyslog never got the retries or the spool. One message per
+# batch, so a retry never sends one twice
+class LocalTransport(Transport):
+    name = "local"
+    batch_size = 1
+
+    def __init__(self, address=LOCAL_SYSLOG_ADDRESS, **kwargs):
+        self.address = address
+        self.sock = None
+        self.formatter = SyslogFormatter(logging.BASIC_FORMAT)
+        super().__init__(**kwargs)
+
+    # /dev/log is a datagram socket, or a stream one on some systems (the logging handler tries both the same way)
+    def connect(self):
+        for socktype in (socket.SOCK_DGRAM, socket.SOCK_STREAM):
+            sock = socket.socket(socket.AF_UNIX, socktype)
+            try:
+                sock.connect(self.address)
+            except OSError as err:
+                sock.close()
+                if err.errno != errno.EPROTOTYPE:
+                    raise
+                continue
+            self.sock = sock
+            return
+        raise OSError(errno.EPROTOTYPE, os.strerror(errno.EPROTOTYPE))
+
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def deliver(self, batch):
+        if self.sock is None:
+            self.connect()
+        for message in batch:
+            record = logging.LogRecord("hostinfo", logging.WARNING, __file__, 0, '%s', (message,), None)
+            self.sock.sendall("<{0}>{1}\000".format(LOCAL_SYSLOG_PRIORITY, self.formatter.format(record)).encode("utf-8"))
+
+
+# Syslog over one persistent TCP (RFC 6587) or TLS (RFC 5425) connection: RFC 5424 messages with octet-counting framing
+class SyslogTransport(Transport):
+    name = "syslog"
+
+    def __init__(self, address, tls=False, cafile=None, **kwargs):
+        self.address = address
+        self.context = None
+        if tls:
+# ssl, gzip and http.client are only imported by the transports that use them, they cost startup time on every run
+            import ssl
+            self.context = ssl.create_default_context(cafile=cafile)
+        self.sock = None
+        self.header = " {host} hostinfo {pid} - - \ufeff".format(host=socket.getfqdn(), pid=os.getpid())
+        super().__init__(**kwargs)
+
+    def connect(self):
+        sock = socket.create_connection(self.address, timeout=TRANSPORT_CONNECT_TIMEOUT)
+        if self.context is not None:
+            try:
+                sock = self.context.wrap_socket(sock, server_hostname=self.address[0])
+            except OSError:
+                sock.close()
+                raise
+        self.sock = sock
+
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def frame(self, message):
+        timestamp = datetime.utcnow().isoformat() + "Z"
+        message = "<{pri}>1 {timestamp}{header}{message}".format(
+            pri=SYSLOG_PRIORITY, timestamp=timestamp, header=self.header, message=message).encode("utf-8")
+        return str(len(message)).encode("ascii") + b" " + message
+
+    def deliver(self, batch):
+        if self.sock is None:
+            self.connect()
+        self.sock.sendall(b"".join(self.frame(message) for message in batch))
+
+
+# Splunk HTTP Event Collector: batches of events gzipped into one POST over a kept-alive HTTP(S) connection
+class HecTransport(Transport):
+    name = "hec"
+
+    def __init__(self, url, token, cafile=None, **kwargs):
+        import ssl
+        import urllib.parse
+        url = urllib.parse.urlsplit(url)
+        self.https = url.scheme == "https"
+        self.netloc = url.netloc
+        self.path = url.path or "/services/collector/event"
+        self.headers = {"Authorization": "Splunk " + token, "Content-Type": "application/json",
+                        "Content-Encoding": "gzip", "Connection": "keep-alive"}
+        self.context = ssl.create_default_context(cafile=cafile) if self.https else None
+        self.host = hostname()
+        self.connection = None
+        super().__init__(**kwargs)
+
+    def disconnect(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def deliver(self, batch):
+        import gzip
+        import http.client
+        if self.connection is None:
+            if self.https:
+                self.connection = http.client.HTTPSConnection(self.netloc, timeout=TRANSPORT_CONNECT_TIMEOUT, context=self.context)
+            else:
+                self.connection = http.client.HTTPConnection(self.netloc, timeout=TRANSPORT_CONNECT_TIMEOUT)
+        timestamp = now()
+        body = "".join(json.dumps({"time": timestamp, "host": self.host, "source": "hostinfo.py",
+                                   "sourcetype": HEC_SOURCETYPE, "event": message}) for message in batch)
+        try:
+            self.connection.request("POST", self.path, gzip.compress(body.encode("utf-8"), HEC_GZIP_LEVEL), self.headers)
+            response = self.connection.getresponse()
+            reply = response.read()
+        except http.client.HTTPException as err:
+            raise OSError("HEC request failed: {0!r}".format(err))
+        if response.status != 200:
+            raise OSError("HEC returned {0}: {1}".format(response.status, reply[:200].decode("utf-8", "replace")))
+
+
+# Split HOST[:PORT] (IPv6 addresses in brackets) into a socket address
+def host_port(server, port):
+    if server.startswith("["):
+        host, sep, rest = server[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else port
+    if server.count(":") == 1:
+        host, rest = server.split(":")
+        return host, int(rest)
+    return server, port
+
+
+# Build the transport chosen on the command line
+def open_transport(options):
+    kwargs = {"spool_dir": options.spool_dir, "rate_limit": options.rate_limit}
+    if options.transport in ("tcp", "tls"):
+        if not options.server:
+            raise ValueError("--transport {0} needs --server".format(options.transport))
+        return SyslogTransport(host_port(options.server, SYSLOG_PORTS[options.transport]), tls=options.transport == "tls",
+                               cafile=options.ca_file, **kwargs)
+    if options.transport == "hec":
+        token = os.environ.get(HEC_TOKEN_ENV, "")
+        if options.hec_token_file:
+            with open(options.hec_token_file, encoding="utf-8") as file:
+                token = file.read().strip()
+        if not options.hec_url or not token:
+            raise ValueError("--transport hec needs --hec-url and a token (--hec-token-file or ${0})".format(HEC_TOKEN_ENV))
+        return HecTransport(options.hec_url, token, cafile=options.ca_file, **kwargs)
+    return LocalTransport(**kwargs)
+
+
+MACHINE_ID = '/etc/machine-id'
+
+
+# Delay in [0, window) seconds for this host, derived from its machine-id (its hostname when there is none) so every
+# host starts at its own, stable, point in the window and a fleet scheduled at the same minute spreads evenly over it
+def splay_delay(window):
+    try:
+        with open(MACHINE_ID, encoding="ascii") as file:
+            key = file.read().strip()
+    except OSError:
+        key = ""
+    key = key or hostname()
+    digest = int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big")
+    return digest % max(1, int(window * 1000)) / 1000.0
+
+
+# Invalidation keys of a collector whose result is kept between runs: boot_id (the result is dropped on reboot),
+# files whose mtime and size are checked, small files whose content is checked, and a TTL in seconds
+CachePolicy = namedtuple("CachePolicy", ["boot_id", "files", "contents", "ttl"])
+BOOT_ID = '/proc/sys/kernel/random/boot_id'
+
+# Collectors whose results change rarely but cost a subprocess or a full rpm query
+COLLECTOR_CACHE = {
+    "osinfo": CachePolicy(True, ["/etc/os-release", "/etc/redhat-release"], ["/proc/sys/kernel/hostname"], 7 * 24 * 3600),
+    "apps": CachePolicy(False, [os.path.join(RPMDB, name) for name in RPMDB_PACKAGES] + [YUMDB_PATH], [], 7 * 24 * 3600),
+    "hwinfo": CachePolicy(True, [DMIDUMP], [], 30 * 24 * 3600),
+# setenforce changes the mode without touching /etc/selinux/config, so the live mode is part of the key
+    "sestatus": CachePolicy(True, ["/etc/selinux/config"], ["/sys/fs/selinux/enforce"], 24 * 3600),
+# The walk reads the inode of every file on the local filesystems; a new SUID file shows up within a day
+    "setuid_files": CachePolicy(False, [], [], 24 * 3600),
+}
+
+
+# Current values of a collector's invalidation keys (None for a file that does not exist)
+def cache_keys(policy):
+    keys = {}
+    paths = ([BOOT_ID] if policy.boot_id else []) + list(policy.contents)
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as file:
+                keys[path] = file.read().strip()
+        except OSError:
+            keys[path] = None
+    for path in policy.files:
+        try:
+            stat = os.stat(path)
+            keys[path] = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            keys[path] = None
+    return keys
+
+
+# Wrap a collector so its result is read from the cache while none of its keys changed and the TTL has not passed;
+# a Record is stored as its name and fields, a stream as JSON lines written and read back as the items go by, anything
+# else as the JSON value the collector returned
+def cached_collector(name, func, policy):
+    def fresh(entry, keys):
+        return entry and entry.get("keys") == keys and 0 <= now() - entry.get("time", 0) < policy.ttl
+
+    def run():
+        keys = cache_keys(policy)
+        entry = read_cache("collector-" + name)
+        if fresh(entry, keys):
+            result = entry["result"]
+            if "record" in result:
+                return Record(result["record"], [tuple(field) for field in result["fields"]])
+            return result["value"]
+        header, items = read_cache_lines("collector-" + name)
+        if fresh(header, keys):
+            return items
+        result = func()
+        if is_stream(result):
+            return write_cache_lines("collector-" + name, {"keys": keys, "time": now()}, result)
+        if isinstance(result, Record):
+            stored = {"record": result.name, "fields": result.fields}
+        else:
+            stored = {"value": result}
+        write_cache("collector-" + name, {"keys": keys, "time": now(), "result": stored})
+        return result
+    return run
+
+
+# Result placeholder for a collector that missed its deadline or raised, carries the record sent in its place
+class CollectorFailure(object):
+    def __init__(self, name, record):
+        self.name = name
+        self.record = record
+
+
+# Result of a collector whose section was streamed to the run's outlet while it was collected
+SENT = object()
+
+
+# Finish a collector's result on its own thread, so its deadline and metrics cover the work a stream defers: with an
+# outlet a section whose list is a stream is sent as its items come (SENT takes its place), without one every stream
+# is read into a list
+def settle(name, result, outlet):
+    if result is SENT:
+        return result
+    if outlet is not None and name in SECTION_BUILDERS:
+        record = SECTION_BUILDERS[name](result)
+        if isinstance(record, Record):
+            values = [value for key, value in record.fields if is_stream(value) or isinstance(value, (list, tuple))]
+            if len(values) == 1 and is_stream(values[0]):
+                outlet.write_stream(record)
+                return SENT
+    if is_stream(result):
+        return list(result)
+    if isinstance(result, Record):
+        result.fields = [(key, list(value) if is_stream(value) else value) for key, value in result.fields]
+    return result
+
+
+# Start every collector at once on its own daemon thread and give each one a hard deadline,
+# a collector still running at its deadline is abandoned and reported with a timeout record.
+# With a run budget (a monotonic() deadline) they start in COLLECTOR_PRIORITIES order instead, a new one as soon as
+# one of the COLLECTOR_WORKERS running finishes; no deadline reaches past the budget, and a collector the budget cut
+# short or left no time to start is reported as skipped.
+# With an outlet the sections that stream are sent by their collectors (see settle()); an abandoned collector stops
+# at its next message
+def collect(collectors, timeout=COLLECTOR_TIMEOUT, timeouts=COLLECTOR_TIMEOUTS, budget=None, outlet=None):
+    results = {}
+    names = frozenset(name for name, func in collectors)
+    cancels = dict((name, threading.Event()) for name in names)
+    finished = queue.Queue()
+
+    def run(name, func):
+        metrics = metrics_for(name)
+        _current.metrics = metrics
+        _current.outlet = outlet
+        _current.cancel = cancels[name]
+        _current.names = names
+        wall = monotonic()
+        cpu = thread_time()
+        try:
+            result = settle(name, func(), outlet)
+        except Exception as err:
+            metrics.error = "{0}: {1}".format(type(err).__name__, err)
+            result = CollectorFailure(name, Record(name, [("HostInfo_Error", name), ("Error", str(err))]))
+        finally:
+            if not cancels[name].is_set():
+                metrics.wall = monotonic() - wall
+                metrics.cpu += thread_time() - cpu
+            _current.metrics = _current.outlet = _current.cancel = _current.names = None
+        if not cancels[name].is_set():
+            results[name] = result
+        finished.put(name)
+
+    def skip(name):
+        cancels[name].set()
+        metrics_for(name).error = "skipped: run budget exhausted"
+        results[name] = CollectorFailure(name, Record(name, [("HostInfo_Skipped", name), ("Reason", "run budget exhausted")]))
+
+    if budget is None:
+        pending = list(collectors)
+        workers = len(pending)
+    else:
+        pending = sorted(collectors, key=lambda collector: COLLECTOR_PRIORITIES.get(collector[0], COLLECTOR_DEFAULT_PRIORITY))
+        workers = COLLECTOR_WORKERS
+# Running collectors by name: the end of their deadline, the deadline and whether the budget cut it short
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            name, func = pending.pop(0)
+            start = monotonic()
+            if budget is not None and start >= budget:
+                skip(name)
+                continue
+            deadline = timeouts.get(name, timeout)
+            end = start + deadline if budget is None else min(start + deadline, budget)
+            running[name] = (end, deadline, end < start + deadline)
+            thread = threading.Thread(target=run, args=(name, func), name="hostinfo-" + name)
+            thread.daemon = True
+            thread.start()
+        if not running:
+            continue
+        try:
+            running.pop(finished.get(timeout=max(0, min(end for end, deadline, cut in running.values()) - monotonic())), None)
+            continue
+        except queue.Empty:
+            pass
+        for name, (end, deadline, cut) in list(running.items()):
+            if end > monotonic():
+                continue
+            del running[name]
+            if name in results:
+                continue
+            if cut:
+                skip(name)
+                continue
+            cancels[name].set()
+            metrics = metrics_for(name)
+            metrics.wall = deadline
+            metrics.error = "timed out after {0}s".format(deadline)
+            results[name] = CollectorFailure(name, Record(name, [("HostInfo_Timeout", name), ("Deadline", "{0}s".format(deadline))]))
+    return results
+
+
+# Delta mode keeps the last run's sections in the "snapshot" cache entry and sends only what changed,
+# with a full resend once the last full send is older than --full-interval
+FULL_RESEND_INTERVAL = 7 * 24 * 3600
+# Fields that change on every run without anything on the host changing, left out of the snapshot
+SNAPSHOT_VOLATILE = ("ISRHostInfo_LastSent",)
+
+
+# Flatten the records of one section into [key, text] items, one per list entry, in output order
+def section_items(records):
+    items = []
+    for record in records:
+        for key, value in record.fields:
+            if key in SNAPSHOT_VOLATILE:
+                continue
+            if isinstance(value, (list, tuple)):
+                items.extend([key, field_text(item)] for item in value)
+            else:
+                items.append([key, field_text(value)])
+    return items
+
+
+# Content hash of a section, independent of the order of its items
+def section_hash(items):
+    digest = hashlib.sha256()
+    for key, text in sorted(items):
+        digest.update(key.encode("utf-8") + b"\x1f" + text.encode("utf-8") + b"\x1e")
+    return digest.hexdigest()[:16]
+
+
+# Record of the items added to and removed from a section since the snapshot; a key holding a single value
+# on both sides (a scalar field) that differs is reported as changed instead
+def delta_record(name, old, new):
+    old_items = set(tuple(item) for item in old)
+    new_items = set(tuple(item) for item in new)
+    added = [tuple(item) for item in new if tuple(item) not in old_items]
+    removed = [tuple(item) for item in old if tuple(item) not in new_items]
+    old_values = {}
+    new_values = {}
+    for key, text in old:
+        old_values.setdefault(key, []).append(text)
+    for key, text in new:
+        new_values.setdefault(key, []).append(text)
+    changed = [key for key, text in added if len(new_values[key]) == 1 and len(old_values.get(key, ())) == 1]
+    record = Record(name, [("Delta", "changed")])
+    if changed:
+        record.add("Changed", ["{0}={1} -> {2}".format(key, old_values[key][0], new_values[key][0]) for key in changed])
+    changed = set(changed)
+    added = ["{0}={1}".format(key, text) for key, text in added if key not in changed]
+    removed = ["{0}={1}".format(key, text) for key, text in removed if key not in changed]
+    if added:
+        record.add("Added", added)
+    if removed:
+        record.add("Removed", removed)
+    return record
+
+
+# Reduce a run's records to the sections that changed since the snapshot, followed by a heartbeat record carrying
+# every section hash. Sections missing from this run (their collector failed) keep their snapshot and are not
+# reported as removed; a completed section (see gather) that produced no record is stored empty and its old items
+# are reported as removed. Failure records are always sent
+def delta_messages(messages, failures, completed=(), full_interval=FULL_RESEND_INTERVAL, timestamp=None):
+    messages = list(messages)
+    timestamp = now() if timestamp is None else timestamp
+    snapshot = read_cache("snapshot") or {}
+    old_sections = snapshot.get("sections", {})
+    full = "last_full" not in snapshot or timestamp - snapshot["last_full"] >= full_interval
+    sections = {}
+    for message in messages:
+        if not any(message is failure for failure in failures):
+            sections.setdefault(message.name, []).append(message)
+    new_sections = dict(old_sections)
+    changed = []
+    result = []
+    sent = set()
+    for message in messages:
+        if any(message is failure for failure in failures):
+            result.append(message)
+            continue
+        name = message.name
+        if name in sent:
+            continue
+        sent.add(name)
+        items = section_items(sections[name])
+        digest = section_hash(items)
+        new_sections[name] = {"hash": digest, "items": items}
+        old = old_sections.get(name)
+        if old is not None and old["hash"] == digest and not full:
+            continue
+        changed.append(name)
+        if full or old is None:
+            result.extend(sections[name])
+        else:
+            result.append(delta_record(name, old["items"], items))
+    for name in sorted(completed):
+        if name in sent:
+            continue
+        old = old_sections.get(name)
+        new_sections[name] = {"hash": section_hash([]), "items": []}
+        if old is not None and old["items"]:
+            changed.append(name)
+            result.append(delta_record(name, old["items"], []))
+    heartbeat = Record("heartbeat", [
+        ("HostInfo_Heartbeat", str(date)), ("Mode", "full" if full else "delta"),
+        ("Last_Full", datetime.utcfromtimestamp(timestamp if full else snapshot["last_full"]).strftime("%Y-%m-%d %H:%M:%S")),
+        ("Changed_Sections", changed),
+        ("Section_Hashes", ["{0}={1}".format(name, new_sections[name]["hash"]) for name in sorted(new_sections)])])
+    result.append(heartbeat)
+    write_cache("snapshot", {"last_full": timestamp if full else snapshot["last_full"], "sections": new_sections})
+    return result
+
+
+# Run the collectors (all of them, or only the named ones) and build their records in LOG_MESSAGES order.
+# Returns a generator of the records, the list of the failure records among them and the set of completed sections
+# (those whose collectors all succeeded, whether or not they produced a record), both filled in as they are generated.
+# With an outlet the sections that stream have already been sent to it by their collectors and are left out. A record
+# is only built once the previous one has been consumed, and its collector results are released then; a record whose
+# collector failed is replaced by that collector's failure record, and a record whose collectors were not run is
+# left out
+def gather(names=None, budget=None, outlet=None):
+    reset_metrics()
+    collectors = [(name, func) for name, func in COLLECTORS if names is None or name in names]
+# The cache invalidation keys (boot_id, /proc, the rpm database) are the live host's
+    if cache_enabled() and ROOT == '/':
+        collectors = [(name, cached_collector(name, func, COLLECTOR_CACHE[name]) if name in COLLECTOR_CACHE else func)
+                      for name, func in collectors]
+    results = collect(collectors, budget=budget, outlet=outlet)
+    failed = []
+    completed = set()
+
+    def messages():
+        reported = set()
+        for names, message in LOG_MESSAGES:
+            if not all(name in results for name in names):
+                continue
+            values = [results.pop(name) for name in names]
+            failures = [value for value in values if isinstance(value, CollectorFailure)]
+            if not failures:
+                completed.add(names[0])
+            if any(value is SENT for value in values):
+                continue
+            if not failures:
+                message = message(*values)
+                if isinstance(message, list):
+                    yield from message
+                else:
+                    yield message
+            for failure in failures:
+                if failure.name not in reported:
+                    reported.add(failure.name)
+                    failed.append(failure.record)
+                    yield failure.record
+    return messages(), failed, completed
+
+
+# Serialize, chunk and queue records on a transport one at a time, counting the bytes sent for each section.
+# Returns the run ID the chunks were stamped with (a new one unless given)
+def send_messages(transport, messages, run_id=None):
+    outlet = Outlet(transport.send, run_id)
+    for message in messages:
+        outlet.write(message)
+    return outlet.run_id
+
+
+# HostInfo_SelfMetrics record: the run's wall time, CPU of the process and of its subprocesses and peak RSS,
+# then wall_ms, cpu_ms, spawns, bytes and error fields for every collector and section
+def self_metrics_record(started):
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    record = Record("self_metrics", [
+        ("HostInfo_SelfMetrics", str(date)),
+        ("Run_Wall_ms", round((monotonic() - started) * 1000)),
+        ("Run_CPU_ms", round((usage.ru_utime + usage.ru_stime) * 1000)),
+        ("Subprocess_CPU_ms", round((children.ru_utime + children.ru_stime) * 1000)),
+        ("Subprocesses", sum(metric.spawns for metric in metrics)),
+        ("Bytes_Sent", sum(metric.bytes for metric in metrics)),
+        ("Peak_RSS_KB", usage.ru_maxrss),
+        ("Governor", GOVERNOR)])
+    for metric in metrics:
+        record.fields.extend([(metric.name + "_wall_ms", round(metric.wall * 1000)), (metric.name + "_cpu_ms", round(metric.cpu * 1000)),
+                              (metric.name + "_spawns", metric.spawns), (metric.name + "_bytes", metric.bytes)])
+        if metric.error:
+            record.add(metric.name + "_error", metric.error)
+    return record
+
+
+# --profile: the per-collector metrics as a table on stderr
+def print_profile(record):
+    fields = dict(record.fields)
+    sys.stderr.write("{0:<20} {1:>10} {2:>10} {3:>7} {4:>10}  {5}\n".format("collector", "wall_ms", "cpu_ms", "spawns", "bytes", "error"))
+    names = [key[:-len("_wall_ms")] for key, value in record.fields if key.endswith("_wall_ms") and key != "Run_Wall_ms"]
+    for name in names:
+        sys.stderr.write("{0:<20} {1:>10} {2:>10} {3:>7} {4:>10}  {5}\n".format(
+            name, fields[name + "_wall_ms"], fields[name + "_cpu_ms"], fields[name + "_spawns"], fields[name + "_bytes"],
+            fields.get(name + "_error", "")))
+    sys.stderr.write("run: wall {0} ms, cpu {1} ms, subprocess cpu {2} ms, {3} subprocesses, {4} bytes sent, peak RSS {5} KB\n".format(
+        fields["Run_Wall_ms"], fields["Run_CPU_ms"], fields["Subprocess_CPU_ms"], fields["Subprocesses"],
+        fields["Bytes_Sent"], fields["Peak_RSS_KB"]))
+
+
+# Send the self-metrics record after a run's records, with the same run ID
+def send_self_metrics(transport, started, run_id):
+    record = self_metrics_record(started)
+    send_messages(transport, [record], run_id)
+    if OPTIONS.profile:
+        print_profile(record)
+
+
+# Build log entries and sends them to syslog
+def logs():
+    started = monotonic()
+
+# Send the Log Messages through the chosen transport (by default local syslog, forwarded by rsyslog to the centralized
+# log host / Splunk and stored in /var/log/messages). The sections that stream (packages, accounts, sudoers, sockets,
+# processes, SUID files) are sent by their collectors as they are read, the other records once collection is done;
+# --delta compares whole sections, so it holds them all
+    transport = open_transport(OPTIONS)
+    try:
+        outlet = Outlet(transport.send)
+        messages, failed, completed = gather(budget=started + OPTIONS.budget if OPTIONS.budget else None,
+                                             outlet=None if OPTIONS.delta else outlet)
+        if OPTIONS.delta:
+            messages = delta_messages(messages, failed, completed, OPTIONS.full_interval * 24 * 3600)
+        for message in messages:
+            outlet.write(message)
+        send_self_metrics(transport, started, outlet.run_id)
+    finally:
+        transport.close()
+        evict_cache()
+
+
+# inotify(7) constants from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_CHANGES = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("=iIII")
+
+
+# Minimal inotify(7) binding through ctypes: directory watches and a blocking read of (directory, name, mask) events
+class Inotify(object):
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self.poll = select.poll()
+        self.poll.register(self.fd, select.POLLIN)
+
+    def add_watch(self, path, mask=IN_CHANGES):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        self.watches[wd] = path
+
+    # Wait up to timeout seconds (None: forever) for events; an overflowed queue is reported as (None, None, IN_Q_OVERFLOW)
+    def read(self, timeout=None):
+        if not self.poll.poll(None if timeout is None else max(0, int(timeout * 1000))):
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    events.append((None, None, mask))
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                events.append((self.watches.get(wd), os.fsdecode(name), mask))
+
+    def close(self):
+        os.close(self.fd)
+
+
+# What the agent watches: (directory, file name or None for anything in it, collectors it feeds). Files are watched
+# through their directory because useradd, vipw and visudo replace them with a rename
+SUDOERS_D = '/etc/sudoers.d'
+ACCOUNT_COLLECTORS = ("user_accounts", "service_accounts", "monikers", "inspect_accounts")
+AGENT_WATCHES = [
+    (os.path.dirname(PASSWD), os.path.basename(PASSWD), ACCOUNT_COLLECTORS),
+    (os.path.dirname(SHADOW), os.path.basename(SHADOW), ("root_change", "password_aging")),
+# No collector reports /etc/group, but %group sudoers rules are granted through it
+    ("/etc", "group", ("sudoers",)),
+    (os.path.dirname(SUDOERS), os.path.basename(SUDOERS), ("sudoers",)),
+    (os.path.dirname(SUDOERS_D), os.path.basename(SUDOERS_D), ("sudoers",)),
+    (SUDOERS_D, None, ("sudoers",)),
+] + [(RPMDB, name, ("apps", "vulnerabilities")) for name in RPMDB_PACKAGES]
+# An event burst (a yum transaction, useradd) is collected once it has been quiet this long, or after the max delay
+AGENT_DEBOUNCE = 2.0
+AGENT_MAX_DELAY = 10.0
+
+
+# Forget what the last collection read, so re-run collectors see the current files
+def reset_run_caches():
+    global _interface_snapshot
+    with _command_locks_guard:
+        _command_cache.clear()
+    with _account_sections_lock:
+        _account_sections.clear()
+    with _shadow_tables_lock:
+        _shadow_tables.clear()
+    with _interface_snapshot_lock:
+        _interface_snapshot = None
+
+
+# Collectors fed by a batch of inotify events, every watched collector when the event queue overflowed
+def affected_collectors(events):
+    names = set()
+    for directory, name, mask in events:
+        for watch_directory, watch_name, collectors in AGENT_WATCHES:
+            if directory is None or (directory == watch_directory and watch_name in (None, name)):
+                names.update(collectors)
+    return names
+
+
+# Long-running agent: one complete (delta) run at start and every --full-interval, in between only the collectors
+# fed by changed files are re-run once a burst of inotify events has settled, over one transport kept open
+def agent():
+    inotify = Inotify()
+    for directory in sorted(set(watch[0] for watch in AGENT_WATCHES)):
+        try:
+            inotify.add_watch(directory)
+        except OSError:
+            continue
+    interval = OPTIONS.full_interval * 24 * 3600
+    transport = open_transport(OPTIONS)
+    try:
+        next_full = 0
+        while True:
+            if monotonic() >= next_full:
+                names = None
+                next_full = monotonic() + interval
+            else:
+                events = inotify.read(next_full - monotonic())
+                if not events:
+                    continue
+                deadline = monotonic() + AGENT_MAX_DELAY
+                while monotonic() < deadline:
+                    more = inotify.read(min(AGENT_DEBOUNCE, deadline - monotonic()))
+                    if not more:
+                        break
+                    events.extend(more)
+                if any(name == os.path.basename(SUDOERS_D) and directory == os.path.dirname(SUDOERS_D)
+                       for directory, name, mask in events):
+                    try:
+                        inotify.add_watch(SUDOERS_D)
+                    except OSError:
+                        pass
+                names = affected_collectors(events)
+                if not names:
+                    continue
+            started = monotonic()
+            reset_run_caches()
+            messages, failed, completed = gather(names, started + OPTIONS.budget if OPTIONS.budget else None)
+# Only a complete collection may count as the periodic full resend
+            messages = delta_messages(messages, failed, completed, interval if names is None else float("inf"))
+            run_id = send_messages(transport, messages)
+            send_self_metrics(transport, started, run_id)
+            evict_cache()
+    finally:
+        transport.close()
+        inotify.close()
+
+
+# With --root, at most this many roots per worker process are in flight: being scanned, waiting for a worker or
+# waiting to be sent
+SCAN_QUEUE_FACTOR = 2
+
+
+# Roots to scan: every --root, then the lines of every --roots-from file ('-' for stdin), read as they are needed
+def root_paths(options):
+    for root in options.root or []:
+        yield root
+    for path in options.roots_from or []:
+        file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+# Scan one root in a worker process: the OFFLINE_COLLECTORS with the paths, host name and caches of that root (its
+# own directory under cache_dir, so --delta works per root), every record stamped with the root. The records are
+# chunked and serialized here, in the worker, and go back to the parent as the messages to send. Errors are sent as a
+# record so one broken image does not stop the others
+def scan_root(root, cache_dir, run_id):
+    global ROOT, CACHE_DIR
+    ROOT = os.path.abspath(root)
+    CACHE_DIR = os.path.join(cache_dir, "roots", hashlib.sha256(ROOT.encode("utf-8")).hexdigest()[:16])
+    reset_run_caches()
+    started = monotonic()
+    messages = []
+    outlet = Outlet(messages.append, run_id, [("HostInfo_Root", ROOT)])
+    try:
+        if not os.path.isdir(ROOT):
+            raise CollectorError("{root} is not a directory".format(root=ROOT))
+        records, failed, completed = gather(OFFLINE_COLLECTORS, started + OPTIONS.budget if OPTIONS.budget else None,
+                                            None if OPTIONS.delta else outlet)
+        if OPTIONS.delta:
+            records = delta_messages(records, failed, completed, OPTIONS.full_interval * 24 * 3600)
+        for record in records:
+            outlet.write(record)
+        evict_cache()
+    except Exception as err:
+        outlet.write(Record("root", [("HostInfo_Error", "root"), ("Error", "{0}: {1}".format(type(err).__name__, err))]))
+    finally:
+        reset_run_caches()
+    return messages
+
+
+# --root: scan every root in a pool of worker processes and send the records of each root as soon as it is done,
+# under one run ID. Roots are read and submitted only as results come back, so memory stays bounded however many
+# roots there are
+def scan_roots():
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    started = monotonic()
+    jobs = OPTIONS.jobs or os.cpu_count() or 1
+    roots = root_paths(OPTIONS)
+    run_id = uuid.uuid4().hex
+    transport = None
+# The advisory index is opened once here, the workers inherit the mapping (the feed is the scanning host's)
+    feed = advisory_feed()
+    if feed is not None:
+        try:
+            advisory_index(feed)
+        except (OSError, ValueError, SyntaxError):
+            pass
+    try:
+        with ProcessPoolExecutor(jobs) as pool:
+            pending = set()
+            while True:
+                for root in itertools.islice(roots, jobs * SCAN_QUEUE_FACTOR - len(pending)):
+                    pending.add(pool.submit(scan_root, root, CACHE_DIR, run_id))
+                if not pending:
+                    break
+# The first submissions start the workers, which are forked before the transport starts its sender thread
+                if transport is None:
+                    transport = open_transport(OPTIONS)
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                metrics = metrics_for("roots")
+                for future in done:
+                    for message in future.result():
+                        metrics.bytes += len(message.encode("utf-8"))
+                        transport.send(message)
+        if transport is not None:
+            send_self_metrics(transport, started, run_id)
+    finally:
+        if transport is not None:
+            transport.close()
+
+
+# Collectors that read files and so also work on a system under --root; the others describe the running kernel
+# (interfaces, sockets, processes, clock, live SELinux mode) and are not run for a root
+OFFLINE_COLLECTORS = ("osinfo", "apps", "vulnerabilities", "hwinfo", "root_change", "password_aging", "user_accounts",
+                      "service_accounts", "sudoers", "monikers", "inspect_accounts", "setuid_files")
+
+# Collectors started by logs(), each is run exactly once per run
+COLLECTORS = [
+    ("osinfo", osinfo),
+    ("apps", apps),
+    ("vulnerabilities", vulnerabilities),
+    ("interfaces", interfaces),
+    ("ipaddrpri", ipaddrpri),
+    ("macaddr", macaddr),
+    ("time", time),
+    ("ifaddrall", ifaddrall),
+    ("hwinfo", hwinfo),
+    ("netstat", netstat),
+    ("processes", processes),
+    ("setuid_files", setuid_files),
+    ("root_change", root_change),
+    ("password_aging", password_aging),
+    ("sestatus", sestatus),
+    ("user_accounts", user_accounts),
+    ("service_accounts", service_accounts),
+    ("sudoers", sudoers),
+    ("monikers", monikers),
+    ("inspect_accounts", inspect_accounts),
+]
+
+# Log records in the order logs() sends them, built from the named collector results
+LOG_MESSAGES = [
+    (("osinfo",), lambda osinfo: Record("osinfo", [("ISRHostInfo_LastSent", str(date))] + osinfo.fields)),
+    (("apps",), lambda apps: Record("apps", [("Installed_Packages", apps)])),
+    (("vulnerabilities",), lambda vulnerabilities: vulnerabilities),
+    (("interfaces", "ipaddrpri", "macaddr"), lambda interfaces, ipaddrpri, macaddr: Record("interfaces", [("Interface_Names", interfaces), ("Primary_IP", ipaddrpri), ("MAC_Address(es)", macaddr)])),
+    (("time",), lambda time: time),
+    (("ifaddrall",), lambda ifaddrall: Record("ifaddrall", [("All_Interface_Address_Info", ifaddrall)])),
+    (("hwinfo",), lambda hwinfo: hwinfo),
+    (("netstat",), lambda netstat: Record("netstat", [("Active_Sockets", netstat)])),
+    (("processes",), lambda processes: Record("processes", [("Running_Processes", processes)])),
+    (("setuid_files",), lambda setuid_files: Record("setuid_files", [("SUID_SGID_Files", setuid_files)])),
+    (("root_change",), lambda root_change: root_change),
+    (("password_aging",), lambda password_aging: password_aging),
+    (("sestatus",), lambda sestatus: sestatus),
+    (("user_accounts",), lambda user_accounts: Record("user_accounts", [("User_Accounts", user_accounts)])),
+    (("service_accounts",), lambda service_accounts: Record("service_accounts", [("Service_Accounts", service_accounts)])),
+    (("sudoers",), lambda sudoers: Record("sudoers", [("Sudoers_Entries", sudoers)])),
+    (("monikers",), lambda monikers: Record("monikers", [("Monikers", monikers)])),
+    (("inspect_accounts",), lambda inspect_accounts: inspect_accounts),
+]
+# The sections built from a single collector's result, the ones that can stream
+SECTION_BUILDERS = dict((names[0], message) for names, message in LOG_MESSAGES if len(names) == 1)
+
+
+# Resource governor: what govern() applied to this process (and so to every command it runs), for the self metrics
+GOVERNOR = []
+GOVERNOR_ENV = 'HOSTINFO_GOVERNED'
+# Marker file the run started in the systemd scope deletes first thing, so the parent can tell it ran
+SCOPE_MARKER_ENV = 'HOSTINFO_SCOPE_MARKER'
+CGROUP_ROOT = '/sys/fs/cgroup'
+CGROUP_NAME = 'hostinfo'
+CPU_PERIOD_US = 100000
+# ioprio_set(2) syscall numbers, classes and who-argument from linux/ioprio.h
+IOPRIO_SET = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "ppc64le": 273, "ppc64": 273, "s390x": 282}
+IOPRIO_CLASSES = {"best-effort": (2, 7), "idle": (3, 0)}
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_WHO_PROCESS = 1
+
+
+# Lower the IO priority of this process with ioprio_set(2), children inherit it
+def set_ioprio(name):
+    ioclass, level = IOPRIO_CLASSES[name]
+    number = IOPRIO_SET.get(platform.machine())
+    if number is None:
+        raise OSError("ioprio_set is not known on {0}".format(platform.machine()))
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, (ioclass << IOPRIO_CLASS_SHIFT) | level) < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+# Write one cgroup control file
+def cgroup_write(path, name, value):
+    with open(os.path.join(path, name), "w", encoding="ascii") as file:
+        file.write(str(value))
+
+
+# Move this process into its own capped cgroup through cgroupfs, v2 (unified) or v1 (the hierarchies of the capped controllers only)
+def cgroup_limit(cpu_percent, memory_mb):
+    if os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+        path = os.path.join(CGROUP_ROOT, CGROUP_NAME)
+        try:
+            cgroup_write(CGROUP_ROOT, "cgroup.subtree_control", "+cpu +memory")
+        except OSError:
+            pass
+        os.makedirs(path, exist_ok=True)
+        if cpu_percent:
+            cgroup_write(path, "cpu.max", "{0} {1}".format(int(cpu_percent * CPU_PERIOD_US / 100), CPU_PERIOD_US))
+        if memory_mb:
+            cgroup_write(path, "memory.max", memory_mb * 1024 * 1024)
+        cgroup_write(path, "cgroup.procs", os.getpid())
+        return "cgroup v2 " + path
+    paths = []
+    for controller, wanted in (("cpu", cpu_percent), ("memory", memory_mb)):
+        if wanted and not os.path.exists(os.path.join(CGROUP_ROOT, controller, "cgroup.procs")):
+            raise OSError("no {0} cgroup hierarchy under {1}".format(controller, CGROUP_ROOT))
+    if cpu_percent:
+        path = os.path.join(CGROUP_ROOT, "cpu", CGROUP_NAME)
+        os.makedirs(path, exist_ok=True)
+        cgroup_write(path, "cpu.cfs_period_us", CPU_PERIOD_US)
+        cgroup_write(path, "cpu.cfs_quota_us", int(cpu_percent * CPU_PERIOD_US / 100))
+        paths.append(path)
+    if memory_mb:
+        path = os.path.join(CGROUP_ROOT, "memory", CGROUP_NAME)
+        os.makedirs(path, exist_ok=True)
+        cgroup_write(path, "memory.limit_in_bytes", memory_mb * 1024 * 1024)
+        paths.append(path)
+    for path in paths:
+        cgroup_write(path, "cgroup.procs", os.getpid())
+    return "cgroup v1 " + ",".join(paths)
+
+
+# Re-run this command in a transient systemd scope with the CPU and memory caps, and exit with its status once it is
+# done. Returns None when systemd is not running the host (no /run/systemd/system, the sd_booted() check), or with
+# the reason when the scope could not be used (no systemd-run, no D-Bus, no permission): systemd-run then exits
+# without starting the command, which would have deleted the marker file
+def systemd_scope(cpu_percent, memory_mb):
+    if not os.path.isdir("/run/systemd/system"):
+        return None
+    systemd_run = shutil.which("systemd-run")
+    if systemd_run is None:
+        return "systemd scope failed: systemd-run not found"
+    argv = [systemd_run, "--scope", "--quiet", "--unit", "hostinfo-{0}".format(os.getpid())]
+    if cpu_percent:
+        argv += ["-p", "CPUQuota={0}%".format(cpu_percent)]
+    if memory_mb:
+        memory = "MemoryMax" if os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")) else "MemoryLimit"
+        argv += ["-p", "{0}={1}M".format(memory, memory_mb)]
+    fd, marker = tempfile.mkstemp(prefix="hostinfo-scope-")
+    os.close(fd)
+    env = dict(os.environ)
+    env[GOVERNOR_ENV] = "systemd scope"
+    env[SCOPE_MARKER_ENV] = marker
+    try:
+        proc = subprocess.Popen(argv + [sys.executable] + sys.argv, env=env)
+    except OSError as err:
+        os.unlink(marker)
+        return "systemd scope failed: {0}".format(err)
+# The scoped run gets the SIGTERM (systemctl stop) this process gets, and the terminal's SIGINT on its own
+    handlers = (signal.signal(signal.SIGTERM, lambda signum, frame: proc.send_signal(signum)),
+                signal.signal(signal.SIGINT, signal.SIG_IGN))
+    status = proc.wait()
+    signal.signal(signal.SIGTERM, handlers[0])
+    signal.signal(signal.SIGINT, handlers[1])
+    if not os.path.exists(marker):
+        sys.exit(status if status >= 0 else 128 - status)
+    os.unlink(marker)
+    return "systemd scope failed: systemd-run exited with {0}".format(status)
+
+
+# Lower this process's CPU (nice) and IO (ioprio) priority and cap its CPU and memory, in a systemd scope when systemd
+# runs the host and a cgroup of its own otherwise; under systemd a scope that failed is not replaced by a cgroup
+# written behind systemd's back, which owns the tree. Everything is best effort: what could not be applied is recorded
+# in GOVERNOR and the run goes on
+def govern(options):
+    if options.cpu_quota or options.memory_max:
+        if os.environ.get(GOVERNOR_ENV):
+            try:
+                os.unlink(os.environ.pop(SCOPE_MARKER_ENV, ""))
+            except OSError:
+                pass
+            GOVERNOR.append(os.environ[GOVERNOR_ENV])
+        else:
+            failed = systemd_scope(options.cpu_quota, options.memory_max)
+            if failed:
+                GOVERNOR.append(failed)
+            else:
+                try:
+                    GOVERNOR.append(cgroup_limit(options.cpu_quota, options.memory_max))
+                except OSError as err:
+                    GOVERNOR.append("cgroup failed: {0}".format(err))
+    if options.nice:
+        try:
+            GOVERNOR.append("nice {0}".format(os.nice(options.nice)))
+        except OSError as err:
+            GOVERNOR.append("nice failed: {0}".format(err))
+    if options.ionice != "none":
+        try:
+            set_ioprio(options.ionice)
+            GOVERNOR.append("ionice " + options.ionice)
+        except (OSError, AttributeError) as err:
+            GOVERNOR.append("ionice failed: {0}".format(err))
+
+
+# Define the command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Send security-relevant host information to syslog")
+    parser.add_argument("--listen-only", action="store_true",
+                        help="report listening sockets only, skipping established connections")
+    parser.add_argument("--hwclock", action="store_true",
+                        help="fall back to the (slow) hwclock and ntpstat commands when adjtimex() is unavailable")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="kv",
+                        help="message format: key='value' pairs (default), one JSON object per message or CEF")
+    parser.add_argument("--max-message-size", type=int, default=MESSAGE_BUDGET, metavar="BYTES",
+                        help="split messages on item boundaries so none is larger than BYTES (default %(default)s)")
+    parser.add_argument("--transport", choices=("local", "tcp", "tls", "hec"), default="local",
+                        help="send through local syslog (default), syslog over TCP or TLS, or the Splunk HTTP Event Collector")
+    parser.add_argument("--server", metavar="HOST[:PORT]",
+                        help="syslog server for --transport tcp (default port 601) or tls (default port 6514)")
+    parser.add_argument("--hec-url", metavar="URL",
+                        help="HTTP Event Collector endpoint, e.g. https://splunk:8088/services/collector/event")
+    parser.add_argument("--hec-token-file", metavar="PATH",
+                        help="file holding the HEC token (default: the ${0} environment variable)".format(HEC_TOKEN_ENV))
+    parser.add_argument("--ca-file", metavar="PATH", help="CA bundle used to verify the TLS syslog server or HEC")
+    parser.add_argument("--delta", action="store_true",
+                        help="send only the items added, removed or changed since the last run, plus a heartbeat")
+    parser.add_argument("--full-interval", type=float, default=FULL_RESEND_INTERVAL / (24 * 3600), metavar="DAYS",
+                        help="in --delta mode, resend everything when the last full send is older than DAYS (default %(default)s)")
+    parser.add_argument("--agent", action="store_true",
+                        help="keep running and re-collect accounts, shadow, sudoers and packages as soon as their files "
+                             "change (inotify), sending only what changed")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the wall and CPU time, subprocesses, bytes sent and error of every collector to stderr")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="run every collector, ignoring (and not updating) results cached by earlier runs")
+    parser.add_argument("--splay", type=float, default=0, metavar="SECONDS",
+                        help="wait a fixed per-host delay (from the machine-id) of up to SECONDS before collecting, "
+                             "so hosts scheduled at the same time do not run at once")
+    parser.add_argument("--rate-limit", type=int, default=0, metavar="BYTES",
+                        help="send at most BYTES per second (token bucket), 0 for no limit")
+    parser.add_argument("--nice", type=int, default=10, metavar="N",
+                        help="lower the CPU priority of the run (and its commands) by N (default %(default)s, 0 to keep it)")
+    parser.add_argument("--ionice", choices=("best-effort", "idle", "none"), default="best-effort",
+                        help="IO priority of the run: lowest best-effort level (default), idle class, or unchanged")
+    parser.add_argument("--cpu-quota", type=float, default=0, metavar="PERCENT",
+                        help="cap the run at PERCENT of one CPU in a systemd scope or cgroup (0, the default: no cap)")
+    parser.add_argument("--memory-max", type=int, default=0, metavar="MB",
+                        help="cap the memory of the run at MB in a systemd scope or cgroup (0, the default: no cap)")
+    parser.add_argument("--budget", type=float, default=0, metavar="SECONDS",
+                        help="total wall-clock budget for collecting; collectors run by priority and those the budget "
+                             "does not reach are reported as skipped (0, the default: no budget)")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, metavar="PATH",
+                        help="where undelivered messages are kept for the next run (default %(default)s)")
+    parser.add_argument("--advisories", metavar="PATH",
+                        help="offline advisory feed (updateinfo.xml or Red Hat OVAL, optionally .gz or .bz2) to match the "
+                             "installed packages against (default: the first of {0} that exists)".format(", ".join(ADVISORY_FEEDS)))
+    parser.add_argument("--root", action="append", metavar="PATH",
+                        help="scan the accounts, sudoers, shadow and packages of the system mounted or unpacked at PATH "
+                             "(a disk image, chroot or container image) instead of the live host; repeatable")
+    parser.add_argument("--roots-from", action="append", metavar="FILE",
+                        help="read more --root paths from FILE, one per line ('-' for stdin)")
+    parser.add_argument("--jobs", type=int, default=0, metavar="N",
+                        help="with --root, scan N roots in parallel (default: one per CPU)")
+    options = parser.parse_args(argv)
+    if options.agent and (options.root or options.roots_from):
+        parser.error("--agent watches the live host and cannot be combined with --root")
+    return options
+
+
+# Options used by the collectors, replaced by the real command line in main()
+OPTIONS = parse_args([])
+
+
+# Define the main
+def main():
+    global OPTIONS
+    OPTIONS = parse_args()
+    govern(OPTIONS)
+    if OPTIONS.splay > 0:
+        sleep(splay_delay(OPTIONS.splay))
+    try:
+        if OPTIONS.agent:
+# SIGTERM (systemctl stop) unwinds the agent so queued messages are delivered or spooled
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            agent()
+        elif OPTIONS.root or OPTIONS.roots_from:
+            scan_roots()
+        else:
+            logs()
+    except Exception as err:
+        sys.stderr.write("Issues running the hostinfo.py logging script, need to investigate why\n")
+        traceback.print_exc()
+        syslog_logger().warning("At least one log message failed on %s while running the hostinfo.py logging script: %s: %s",
+                                hostname(), type(err).__name__, err)
         exit(1)
     return
 